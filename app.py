@@ -2,7 +2,6 @@ from flask import Flask
 from routes.main_routes import main_bp
 from routes.account_routes import account_bp
 from routes.symbol_routes import symbol_bp
-from routes.order_routes import order_bp
 from routes.active_routes import active_bp 
 import os
 app = Flask(__name__)
@@ -11,8 +10,26 @@ app.secret_key = os.environ.get("SECRET_KEY", "my_super_secret_key")
 app.register_blueprint(main_bp)
 app.register_blueprint(account_bp)
 app.register_blueprint(symbol_bp)
-app.register_blueprint(order_bp)
 app.register_blueprint(active_bp)   # <- aur register bhi karo
 
+def serve():
+    """Serve the app on a multi-threaded WSGI server.
+
+    MT5 calls block, so each request needs its own worker thread; a slow
+    terminal round-trip must not stall /live-data or /api/trades for other
+    clients. waitress is used when installed (gunicorn/gevent do not run on
+    Windows, where the MetaTrader5 package lives); otherwise fall back to
+    Flask's threaded dev server.
+    """
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        # no reloader: it imports every module twice, which would start a
+        # second set of MT5 inits, watcher and cleaner threads
+        debug = os.environ.get("FLASK_DEBUG", "0") == "1"
+        app.run(debug=debug, threaded=True, use_reloader=False)
+        return
+    waitress_serve(app, host="127.0.0.1", port=5000, threads=32)
+
 if __name__ == "__main__":
-    app.run(debug=True)
+    serve()
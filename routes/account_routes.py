@@ -1,14 +1,15 @@
 # account_routes.py
 from flask import Blueprint, render_template, request, redirect, url_for
-import json
 import os
 import MetaTrader5 as mt5
+from utils.config_cache import CONFIG_FILE, load_config as load_cached_config, save_config, flush_config
+from utils.helpers import mt5_lock
+from utils.mt5_session import ensure_mt5
 
 account_bp = Blueprint("account", __name__)
-CONFIG_FILE = "config.json"
 
 # ---------------- Config helpers ----------------
-def load_config():
+def load_config(for_update=False):
     if not os.path.exists(CONFIG_FILE):
         # Create default config if not exists
         default_config = {
@@ -22,26 +23,26 @@ def load_config():
             "symbols": {}
         }
         save_config(default_config)
-        return default_config
-    with open(CONFIG_FILE, "r") as f:
-        return json.load(f)
-
-def save_config(config):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=4)
+        flush_config()  # later requests check os.path.exists()
+    # the cached copy, not default_config: callers mutate what they get before saving
+    return load_cached_config(for_update=for_update)
 
 # ---------------- MT5 connect helper ----------------
 def connect_mt5(account, password, server):
-    if not mt5.initialize():
+    if not ensure_mt5():
         return False, "MT5 initialize failed"
-    if not mt5.login(account, password=password, server=server):
-        return False, f"MT5 login failed: {mt5.last_error()}"
+    with mt5_lock:
+        info = mt5.account_info()
+        if info and info.login == account and info.server == server:
+            return True, None  # already logged in to this account
+        if not mt5.login(account, password=password, server=server):
+            return False, f"MT5 login failed: {mt5.last_error()}"
     return True, None
 
 # ---------------- Account route ----------------
 @account_bp.route("/account", methods=["GET", "POST"])
 def account():
-    config = load_config()
+    config = load_config(for_update=request.method == "POST")
     message = None
 
     if request.method == "POST":
@@ -73,7 +74,8 @@ def account():
             config.get("server")
         )
         if success:
-            info = mt5.account_info()
+            with mt5_lock:
+                info = mt5.account_info()
             if info:
                 account_info = {
                     "account": info.login,
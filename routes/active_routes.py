@@ -1,16 +1,22 @@
 # routes/active_routes.py
-from flask import Blueprint, render_template, request, jsonify
+from flask import Blueprint, render_template, request
+import sys
+from functools import lru_cache
 import MetaTrader5 as mt5
+from utils.fastjson import jsonify_fast
+from routes.main_routes import market_snapshot
+from utils.mt5_session import ensure_mt5
+from utils.helpers import mt5_lock
 
 # ---------------- Define Blueprint ----------------
 active_bp = Blueprint("active", __name__)
 
 # ---------------- MT5 Initialization ----------------
 def initialize_mt5():
-    if not mt5.initialize():
-        print("[DEBUG] MT5 initialization failed:", mt5.last_error())
+    if not ensure_mt5():
         return False
-    account_info = mt5.account_info()
+    with mt5_lock:
+        account_info = mt5.account_info()
     if account_info:
         print(f"[INFO] MT5 connected successfully. Logged in as account {account_info.login}")
         return True
@@ -21,13 +27,57 @@ def initialize_mt5():
 # Initialize MT5 at startup
 initialize_mt5()
 
-# ---------------- Helper: Get current price ----------------
-def get_current_price(symbol, order_type):
-    tick = mt5.symbol_info_tick(symbol)
-    if not tick:
-        return None
-    # Buy = bid, Sell = ask
-    return tick.bid if order_type == mt5.ORDER_TYPE_BUY else tick.ask
+# ---------------- Helper: Build trades ----------------
+_TYPE_LABEL = {mt5.ORDER_TYPE_BUY: "Buy"}
+
+def build_trades(positions, ticks=None):
+    """Convert MT5 positions to trade dicts, using one tick per unique symbol.
+
+    ticks maps symbol -> tick (e.g. from the market snapshot); missing ones
+    are fetched. Returns (trades, symbols) where symbols is the set of
+    distinct symbols.
+    """
+    symbols = {sys.intern(p.symbol) for p in positions}
+    ticks = ticks or {}
+    missing = symbols - ticks.keys()
+    if missing:
+        with mt5_lock:
+            ticks = {**ticks, **{sym: mt5.symbol_info_tick(sym) for sym in missing}}
+    trades = []
+    for p in positions:
+        sym = sys.intern(p.symbol)
+        tick = ticks.get(sym)
+        # Buy = bid, Sell = ask
+        if tick:
+            price_current = (tick.bid if p.type == mt5.ORDER_TYPE_BUY else tick.ask) or p.price_open
+        else:
+            price_current = p.price_open
+        trades.append({
+            "symbol": sym,
+            "type": _TYPE_LABEL.get(p.type, "Sell"),
+            "volume": p.volume,
+            "price_open": p.price_open,
+            "price_current": price_current,
+            "profit": p.profit,
+            "ticket": p.ticket
+        })
+    return trades, symbols
+
+def filter_trades(trades, selected_symbol):
+    """Case-insensitive symbol filter; upper-cases the selection only once."""
+    sel = selected_symbol.upper()
+    return [t for t in trades if t["symbol"] == sel or t["symbol"].upper() == sel]
+
+@lru_cache(maxsize=8)
+def _empty_active_page(reason):
+    """Rendered empty-state page; it depends only on reason."""
+    return render_template(
+        "active-trades.html",
+        trades=[],
+        symbols=[],
+        selected_symbol=None,
+        reason=reason
+    )
 
 # ---------------- Route: Active Trades HTML ----------------
 @active_bp.route("/active-trades", methods=["GET"])
@@ -35,43 +85,24 @@ def active_trades():
     reason = None
 
     # Ensure MT5 initialized
-    if not mt5.initialize():
-        print("[DEBUG] MT5 not initialized in route, attempting re-init...")
-        if not initialize_mt5():
-            reason = "MT5 not initialized. Start your terminal or check login."
-            return render_template(
-                "active-trades.html",
-                trades=[],
-                symbols=[],
-                selected_symbol=None,
-                reason=reason
-            )
-
-    positions = mt5.positions_get()
-    trades = []
+    if not ensure_mt5():
+        return _empty_active_page("MT5 not initialized. Start your terminal or check login.")
+
+    snap = market_snapshot()
+    positions = snap["positions"]
 
     if positions is None:
-        reason = "MT5 terminal not connected or login missing."
-    elif len(positions) == 0:
-        reason = "No open positions for your account."
-    else:
-        for p in positions:
-            price_current = get_current_price(p.symbol, p.type) or p.price_open
-            trades.append({
-                "symbol": p.symbol,
-                "type": "Buy" if p.type == mt5.ORDER_TYPE_BUY else "Sell",
-                "volume": p.volume,
-                "price_open": p.price_open,
-                "price_current": price_current,
-                "profit": p.profit,
-                "ticket": p.ticket
-            })
+        return _empty_active_page("MT5 terminal not connected or login missing.")
+    if len(positions) == 0:
+        return _empty_active_page("No open positions for your account.")
+
+    trades, symbols = build_trades(positions, snap["ticks"])
 
     # ---------------- Symbol Filter ----------------
-    all_symbols = sorted(set(t["symbol"] for t in trades))
+    all_symbols = sorted(symbols)
     selected_symbol = request.args.get("symbol")
     if selected_symbol:
-        trades = [t for t in trades if t["symbol"].upper() == selected_symbol.upper()]
+        trades = filter_trades(trades, selected_symbol)
 
     # Always return a template
     return render_template(
@@ -88,30 +119,19 @@ def api_trades():
     reason = None
 
     # Ensure MT5 initialized
-    if not mt5.initialize():
-        print("[DEBUG] MT5 not initialized in API, attempting re-init...")
-        if not initialize_mt5():
-            return {"trades": [], "reason": "MT5 not initialized."}, 500
+    if not ensure_mt5():
+        return jsonify_fast({"trades": [], "reason": "MT5 not initialized."}, status=500)
 
-    positions = mt5.positions_get()
+    snap = market_snapshot()
+    positions = snap["positions"]
     trades = []
 
     if positions:
-        for p in positions:
-            price_current = get_current_price(p.symbol, p.type) or p.price_open
-            trades.append({
-                "symbol": p.symbol,
-                "type": "Buy" if p.type == mt5.ORDER_TYPE_BUY else "Sell",
-                "volume": p.volume,
-                "price_open": p.price_open,
-                "price_current": price_current,
-                "profit": p.profit,
-                "ticket": p.ticket
-            })
+        trades, _ = build_trades(positions, snap["ticks"])
 
     # ---------------- Symbol Filter ----------------
     selected_symbol = request.args.get("symbol")
     if selected_symbol:
-        trades = [t for t in trades if t["symbol"].upper() == selected_symbol.upper()]
+        trades = filter_trades(trades, selected_symbol)
 
-    return {"trades": trades, "reason": reason}, 200
+    return jsonify_fast({"trades": trades, "reason": reason})
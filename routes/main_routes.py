@@ -1,119 +1,202 @@
-from flask import Blueprint, render_template, redirect, url_for, jsonify
-import json
+from flask import Blueprint, render_template, redirect, url_for, Response, request, flash, get_flashed_messages
 import threading
 import MetaTrader5 as mt5
 import traceback
 import os
+import sys
 import time
+from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import TimeoutError as FutureTimeout
 
 from utils.utils import run_dynamic_grid      # Your actual bot
 from utils.panic_close import panic_close_all # Panic close all positions
 from utils.cancel_all import cancel_pending_grid_orders # Cancel all pending orders
+from utils.fastjson import jsonify_fast, dumps
+from utils.config_cache import CONFIG_FILE, load_config
+from utils.helpers import mt5_lock, refresh_symbol_info
+from utils.mt5_session import ensure_mt5, check_mt5_connection, submit_mt5_job
+from utils.order_manager import DEFAULT_MAGIC
+from utils.stop_trading import trading_active, trading_stopped, set_trading_active
 
 main_bp = Blueprint("main", __name__)
-CONFIG_FILE = "config.json"
+LIVE_STREAM_INTERVAL = 1       # seconds between MT5 polls for /live-data/stream
+LIVE_STREAM_HEARTBEAT = 15     # seconds between keep-alive comments when idle
+MT5_JOB_TIMEOUT = 30           # seconds a request waits for a queued panic/cancel job
 
 # ----------------- Globals -----------------
-trading_active = False
-status_message = None
-status_type = None
+_active = trading_active  # set while the grid bot should run (shared with utils.stop_trading)
+_status = deque(maxlen=1)    # latest (message, type) from background threads
 _trading_thread = None
 _trading_lock = threading.Lock()  # Lock for thread-safe stop
-_config_lock = threading.Lock()
 _last_config_mtime = 0
 
-# ----------------- Config -----------------
-def load_config():
-    with _config_lock:
-        with open(CONFIG_FILE) as f:
-            return json.load(f)
-
-# ----------------- MT5 Helpers -----------------
-def ensure_mt5():
-    if not mt5.initialize():
-        print("[DEBUG] Initializing MT5...")
-        if not mt5.initialize():
-            print("[ERROR] MT5 initialization failed:", mt5.last_error())
-            return False
-    return True
+# ----------------- Market-state snapshot -----------------
+# One background thread polls MT5 and publishes an immutable snapshot;
+# request handlers read it instead of issuing their own IPC calls.
+_snapshot = {"positions": None, "orders": (), "ticks": {}, "ts": 0.0}
+_poller_lock = threading.Lock()
+_poller_thread = None
 
-def fetch_positions():
-    try:
-        return mt5.positions_get() or []
-    except Exception as e:
-        print("[ERROR] fetch_positions:", e)
-        traceback.print_exc()
-        return []
+def refresh_market_state():
+    """Poll MT5 once and publish a new snapshot (dict rebind is atomic)."""
+    global _snapshot
+    if not ensure_mt5():
+        return _snapshot
+    with mt5_lock:
+        positions = mt5.positions_get()
+        if positions is None:
+            check_mt5_connection()
+        orders = mt5.orders_get()
+        if orders is None:
+            check_mt5_connection()
+            orders = ()
+        ticks = {sym: mt5.symbol_info_tick(sym) for sym in {sys.intern(p.symbol) for p in positions or ()}}
+    _snapshot = {"positions": positions, "orders": orders, "ticks": ticks, "ts": time.time()}
+    return _snapshot
 
-def fetch_pending_orders():
-    try:
-        return mt5.orders_get() or []
-    except Exception as e:
-        print("[ERROR] fetch_pending_orders:", e)
-        traceback.print_exc()
-        return []
+def poll_market_state():
+    while True:
+        try:
+            refresh_market_state()
+        except Exception as e:
+            print("[ERROR] market-state poller:", e)
+        try:
+            delay = load_config().get("loop_delay", 1)
+        except Exception:
+            delay = 1
+        time.sleep(delay)
 
-def serialize_positions_orders():
-    positions_raw = fetch_positions()
-    orders_raw = fetch_pending_orders()
+def market_snapshot():
+    """Return the latest snapshot, starting the poller on first use."""
+    global _poller_thread
+    if _poller_thread is None:
+        with _poller_lock:
+            if _poller_thread is None:
+                refresh_market_state()
+                _poller_thread = threading.Thread(target=poll_market_state, daemon=True)
+                _poller_thread.start()
+    return _snapshot
 
-    positions = [{"symbol": p.symbol, "type": int(p.type), "volume": getattr(p, "volume", 0),
-                  "ticket": p.ticket, "profit": round(getattr(p, "profit", 0), 2)} for p in positions_raw]
+# ----------------- Serialization -----------------
+@dataclass(slots=True)
+class PosOut:
+    symbol: str
+    type: int
+    volume: float
+    ticket: int
+    profit: float
 
-    orders = [{"symbol": o.symbol, "type": int(o.type), "volume": getattr(o, "volume_current", 0),
-               "price": getattr(o, "price_open", 0), "ticket": o.ticket} for o in orders_raw]
+@dataclass(slots=True)
+class OrderOut:
+    symbol: str
+    type: int
+    volume: float
+    price: float
+    ticket: int
+
+def serialize_positions_orders(positions_raw=None, orders_raw=None):
+    if positions_raw is None or orders_raw is None:
+        snap = market_snapshot()
+        if positions_raw is None:
+            positions_raw = snap["positions"] or ()
+        if orders_raw is None:
+            orders_raw = snap["orders"]
+
+    # MT5 TradePosition/TradeOrder are namedtuples, so these fields always exist
+    intern = sys.intern
+    positions = [PosOut(intern(p.symbol), int(p.type), p.volume, p.ticket, round(p.profit, 2))
+                 for p in positions_raw]
+
+    orders = [OrderOut(intern(o.symbol), int(o.type), o.volume_current, o.price_open, o.ticket)
+              for o in orders_raw]
 
     return positions, orders
 
+# ----------------- Status -----------------
+# Request handlers use flash() (per-session). set_status() is only for
+# background threads (bot wrapper), which have no session to flash into.
+def set_status(message, message_type):
+    _status.append((message, message_type))
+
+def pop_status():
+    """Return and clear the latest (message, type); (None, None) if empty."""
+    try:
+        return _status.popleft()
+    except IndexError:
+        return None, None
+
 # ----------------- Trading -----------------
 def trading_active_flag():
-    return trading_active
+    return _active.is_set()
 
 def trading_wrapper(config):
-    global trading_active, status_message, status_type
     try:
         print("[DEBUG] Trading wrapper started")
-        run_dynamic_grid(config, trading_active_flag=trading_active_flag)
+        run_dynamic_grid(config, trading_active_flag=trading_active_flag, stop_event=trading_stopped)
     except Exception as e:
-        status_message = f"Bot error: {str(e)}"
-        status_type = "error"
+        set_status(f"Bot error: {str(e)}", "error")
         print("[ERROR] Trading wrapper exception:", e)
         traceback.print_exc()
     finally:
-        trading_active = False
+        # a restart may already have started a newer thread; don't clear its flag
+        with _trading_lock:
+            if _trading_thread is threading.current_thread():
+                set_trading_active(False)
         print("[INFO] Trading bot stopped")
 
 def start_trading_loop(config=None):
-    global trading_active, status_message, status_type, _trading_thread
-    if trading_active:
-        print("[DEBUG] Trading already active, skipping start")
-        return
-
-    if config is None:
-        config = load_config()
+    """Start the bot thread. Returns True if it was started."""
+    global _trading_thread
+    with _trading_lock:
+        if _active.is_set():
+            print("[DEBUG] Trading already active, skipping start")
+            return False
 
-    trading_active = True
-    status_message = "Trading started successfully!"
-    status_type = "success"
+        if config is None:
+            config = load_config()
 
-    _trading_thread = threading.Thread(target=trading_wrapper, args=(config,), daemon=True)
-    _trading_thread.start()
+        set_trading_active(True)
+        _trading_thread = threading.Thread(target=trading_wrapper, args=(config,), daemon=True)
+        _trading_thread.start()
     print("[INFO] Trading loop started in background thread")
+    return True
 
 def stop_trading_loop():
-    global trading_active, status_message, status_type
+    """Signal the bot thread to stop. Returns True if it was running."""
     with _trading_lock:
-        if not trading_active:
+        if not _active.is_set():
             print("[DEBUG] Stop requested but trading not active")
-            return
+            return False
 
-        trading_active = False
-        status_message = "Trading stopped immediately!"
-        status_type = "success"
+        set_trading_active(False)
         print("[INFO] Trading stop requested immediately")
+    return True
 
 # ----------------- Auto-Restart Config Watcher -----------------
+CONFIG_DEBOUNCE_SECONDS = 0.2  # coalesce editor double-writes
+_restart_timer = None
+_restart_timer_lock = threading.Lock()
+
+def restart_trading_on_config_change():
+    print("[INFO] Config changed, restarting trading loop")
+    refresh_symbol_info()  # symbols may have been added or swapped
+    stop_trading_loop()
+    time.sleep(1)  # short delay to ensure thread stopped
+    start_trading_loop()
+
+def schedule_config_restart():
+    """Debounce config change events into a single restart."""
+    global _restart_timer
+    with _restart_timer_lock:
+        if _restart_timer is not None:
+            _restart_timer.cancel()
+        _restart_timer = threading.Timer(CONFIG_DEBOUNCE_SECONDS, restart_trading_on_config_change)
+        _restart_timer.daemon = True
+        _restart_timer.start()
+
 def watch_config_changes():
+    """Fallback mtime poller used when watchdog is not installed."""
     global _last_config_mtime
     while True:
         try:
@@ -122,26 +205,52 @@ def watch_config_changes():
                 _last_config_mtime = mtime
 
             elif mtime != _last_config_mtime:
-                print("[INFO] Config changed, restarting trading loop")
                 _last_config_mtime = mtime
-                stop_trading_loop()
-                time.sleep(1)  # short delay to ensure thread stopped
-                start_trading_loop()
+                restart_trading_on_config_change()
         except Exception as e:
             print("[ERROR] Config watcher exception:", e)
         time.sleep(1)  # check every 1 second
 
-# Start watcher thread on module load
-threading.Thread(target=watch_config_changes, daemon=True).start()
+def start_config_watcher():
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        print("[DEBUG] watchdog not installed, polling config.json instead")
+        threading.Thread(target=watch_config_changes, daemon=True).start()
+        return None
+
+    config_path = os.path.abspath(CONFIG_FILE)
+
+    class ConfigEventHandler(FileSystemEventHandler):
+        def on_modified(self, event):
+            if not event.is_directory and os.path.abspath(event.src_path) == config_path:
+                schedule_config_restart()
+
+        def on_moved(self, event):
+            # save_config() writes a temp file and os.replace()s it over config.json
+            if not event.is_directory and os.path.abspath(event.dest_path) == config_path:
+                schedule_config_restart()
+
+        on_created = on_modified
+
+    observer = Observer()
+    observer.daemon = True
+    observer.schedule(ConfigEventHandler(), os.path.dirname(config_path), recursive=False)
+    observer.start()
+    return observer
+
+# Start watcher on module load
+_config_observer = start_config_watcher()
 
 # ----------------- Routes -----------------
 @main_bp.route("/")
 def index():
-    global status_message, status_type
-    message = status_message
-    message_type = status_type
-    status_message = None
-    status_type = None
+    flashed = get_flashed_messages(with_categories=True)
+    if flashed:
+        message_type, message = flashed[-1]
+    else:
+        message, message_type = pop_status()
 
     if not ensure_mt5():
         positions, orders = [], []
@@ -150,7 +259,7 @@ def index():
 
     return render_template(
         "index.html",
-        trading_active=trading_active,
+        trading_active=trading_active_flag(),
         status_message=message,
         status_type=message_type,
         positions=positions,
@@ -160,61 +269,102 @@ def index():
 @main_bp.route("/start-trading", methods=["POST"])
 def start_trading():
     print("[DEBUG] /start-trading called")
-    start_trading_loop()
+    if start_trading_loop():
+        flash("Trading started successfully!", "success")
     return redirect(url_for("main.index"))
 
 @main_bp.route("/stop-trading", methods=["POST"])
 def stop_trading():
     print("[DEBUG] /stop-trading called")
-    stop_trading_loop()
+    if stop_trading_loop():
+        flash("Trading stopped immediately!", "success")
     return redirect(url_for("main.index"))
 
 @main_bp.route("/panic-close", methods=["POST"])
 def panic_close():
-    global status_message, status_type
     print("[DEBUG] /panic-close called")
     try:
         if ensure_mt5():
-            panic_close_all()
-            status_message = "All positions and pending orders closed successfully!"
-            status_type = "success"
+            submit_mt5_job(panic_close_all).result(timeout=MT5_JOB_TIMEOUT)
+            flash("All positions and pending orders closed successfully!", "success")
         else:
-            status_message = "MT5 not initialized, cannot panic close."
-            status_type = "error"
+            flash("MT5 not initialized, cannot panic close.", "error")
+    except FutureTimeout:
+        flash("Panic close is still running; check positions shortly.", "info")
     except Exception as e:
-        status_message = f"Panic close failed: {e}"
-        status_type = "error"
+        flash(f"Panic close failed: {e}", "error")
         print("[ERROR] Panic close exception:", e)
         traceback.print_exc()
     return redirect(url_for("main.index"))
 
 @main_bp.route("/cancel-all", methods=["POST"])
 def cancel_all():
-    global status_message, status_type
     print("[DEBUG] /cancel-all called")
     try:
         if ensure_mt5():
-            cancel_pending_grid_orders(symbols=None)
-            status_message = "All pending grid orders canceled successfully!"
-            status_type = "success"
+            submit_mt5_job(cancel_pending_grid_orders, DEFAULT_MAGIC, None).result(timeout=MT5_JOB_TIMEOUT)
+            flash("All pending grid orders canceled successfully!", "success")
         else:
-            status_message = "MT5 not initialized, cannot cancel orders."
-            status_type = "error"
+            flash("MT5 not initialized, cannot cancel orders.", "error")
+    except FutureTimeout:
+        flash("Cancel all is still running; check orders shortly.", "info")
     except Exception as e:
-        status_message = f"Cancel all orders failed: {e}"
-        status_type = "error"
+        flash(f"Cancel all orders failed: {e}", "error")
         print("[ERROR] Cancel all exception:", e)
         traceback.print_exc()
     return redirect(url_for("main.index"))
 
+def live_data_payload():
+    if not ensure_mt5():
+        positions, orders = [], []
+    else:
+        positions, orders = serialize_positions_orders()
+    return {"positions": positions, "orders": orders, "trading_active": trading_active_flag()}
+
+def live_data_etag(positions_raw, orders_raw, active):
+    """Cheap fingerprint of what /live-data would return (ints/floats only, so hash() is stable)."""
+    key = (
+        active,
+        tuple((p.ticket, p.type, p.volume, int(round(p.profit * 100))) for p in positions_raw),
+        tuple((o.ticket, o.type, o.volume_current, o.price_open) for o in orders_raw),
+    )
+    return format(hash(key) & 0xFFFFFFFFFFFFFFFF, "x")
+
 @main_bp.route("/live-data")
 def live_data():
     if not ensure_mt5():
-        return jsonify({"positions": [], "orders": [], "trading_active": trading_active})
-
-    positions, orders = serialize_positions_orders()
-    return jsonify({
-        "positions": positions,
-        "orders": orders,
-        "trading_active": trading_active
-    })
+        return jsonify_fast(live_data_payload())
+
+    snap = market_snapshot()
+    positions_raw = snap["positions"] or ()
+    orders_raw = snap["orders"]
+    active = trading_active_flag()
+    etag = live_data_etag(positions_raw, orders_raw, active)
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers={"ETag": f'"{etag}"'})
+
+    positions, orders = serialize_positions_orders(positions_raw, orders_raw)
+    response = jsonify_fast({"positions": positions, "orders": orders, "trading_active": active})
+    response.set_etag(etag)
+    return response
+
+def live_data_events():
+    """Yield an SSE event whenever the live payload changes."""
+    last = None
+    idle = 0.0
+    while True:
+        body = dumps(live_data_payload())
+        if body != last:
+            last = body
+            idle = 0.0
+            yield b"data: " + body + b"\n\n"
+        elif idle >= LIVE_STREAM_HEARTBEAT:
+            idle = 0.0
+            yield b": keep-alive\n\n"
+        time.sleep(LIVE_STREAM_INTERVAL)
+        idle += LIVE_STREAM_INTERVAL
+
+@main_bp.route("/live-data/stream")
+def live_data_stream():
+    return Response(live_data_events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -1,17 +1,19 @@
-from flask import Blueprint, render_template, request, redirect, flash, jsonify
-import json
+from flask import Blueprint, render_template, request, redirect, flash
 import MetaTrader5 as mt5
-from threading import Thread
+import time
+from threading import Lock
+from utils.config_cache import load_config as load_cached_config, save_config, toggle_symbol_active
+from utils.helpers import mt5_lock, send_order_fast, log_batch_results
+from utils.fastjson import dumps, json_response, jsonify_fast
+from utils.mt5_session import ensure_mt5, submit_mt5_job
 
 # ---------------- Blueprint ----------------
 symbol_bp = Blueprint("symbol", __name__)
-CONFIG_FILE = "config.json"
 
 # ----------------- Config Helpers -----------------
-def load_config() -> dict:
+def load_config(for_update: bool = False) -> dict:
     try:
-        with open(CONFIG_FILE) as f:
-            return json.load(f)
+        return load_cached_config(for_update=for_update)
     except FileNotFoundError:
         return {
             "account": 96861621,
@@ -23,78 +25,99 @@ def load_config() -> dict:
             "symbols": {}
         }
 
-def save_config(config: dict):
-    with open(CONFIG_FILE, "w") as f:
-        json.dump(config, f, indent=4)
-
 # ----------------- Fetch Broker Symbols -----------------
+BROKER_SYMBOLS_TTL = 60  # seconds
+_sym_cache = {"t": 0.0, "names": [], "set": frozenset()}
+_sym_cache_lock = Lock()
+
 def fetch_broker_symbols() -> list:
-    if not mt5.initialize():
-        print("[DEBUG] MT5 not initialized for symbols fetch")
-        return []
-    all_symbols = mt5.symbols_get()
-    mt5.shutdown()
-    return [s.name for s in all_symbols] if all_symbols else []
+    """Return broker symbol names, cached for BROKER_SYMBOLS_TTL seconds."""
+    with _sym_cache_lock:
+        if _sym_cache["names"] and time.monotonic() - _sym_cache["t"] < BROKER_SYMBOLS_TTL:
+            return _sym_cache["names"]
+
+        if not ensure_mt5():
+            print("[DEBUG] MT5 not initialized for symbols fetch")
+            return _sym_cache["names"]
+        with mt5_lock:
+            all_symbols = mt5.symbols_get()
+        if not all_symbols:
+            return _sym_cache["names"]
+
+        names = [s.name for s in all_symbols]
+        _sym_cache["t"] = time.monotonic()
+        _sym_cache["names"] = names
+        _sym_cache["set"] = frozenset(names)
+        return names
+
+def validate_broker_symbol(name: str) -> bool:
+    """Check a single symbol with one symbol_info() call.
+
+    A warm symbols cache answers without any IPC; otherwise only the one
+    symbol struct is fetched instead of the whole Market Watch.
+    """
+    if name in _sym_cache["set"]:
+        return True
+    if not ensure_mt5():
+        print("[DEBUG] MT5 not initialized for symbol validation")
+        return False
+    with mt5_lock:
+        info = mt5.symbol_info(name)
+    return info is not None
 
 # ----------------- MT5 Helpers -----------------
-FILLING_MODES = [mt5.ORDER_FILLING_RETURN, mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_IOC]
+def send_orders_batch(reqs):
+    """Send prepared requests back-to-back, holding the MT5 lock once.
 
-def send_order_fast(request):
-    for filling in FILLING_MODES:
-        request["type_filling"] = filling
-        result = mt5.order_send(request)
-        if result.retcode == mt5.TRADE_RETCODE_DONE:
-            return result
-    return result
+    The terminal serves one IPC call at a time, so a thread pool would
+    only queue on mt5_lock; holding it for the whole batch instead keeps
+    other threads from interleaving between the orders.
+    """
+    with mt5_lock:
+        return [send_order_fast(req) for req in reqs]
 
 # ----------------- Close Pending Orders Only -----------------
 def close_pending_orders(symbol: str):
-    if not mt5.initialize():
+    if not ensure_mt5():
         print("[DEBUG] MT5 init failed for pending order close")
         return
 
-    pending_orders = mt5.orders_get(symbol=symbol) or []
+    with mt5_lock:
+        pending_orders = mt5.orders_get(symbol=symbol) or []
 
     if not pending_orders:
         print(f"[INFO] No pending orders found for {symbol}")
-        mt5.shutdown()
         return
 
     print(f"[INFO] Closing {len(pending_orders)} pending orders for {symbol}")
 
-    for order in pending_orders:
-        req = {
-            "action": mt5.TRADE_ACTION_REMOVE,
-            "order": order.ticket,
-            "symbol": symbol,
-            "magic": order.magic,
-            "comment": "Cancel Pending Order",
-        }
-        result = send_order_fast(req)
-        if result.retcode == mt5.TRADE_RETCODE_DONE:
-            print(f"✅ Canceled pending order {order.ticket}")
-        else:
-            print(f"❌ Failed to cancel pending order {order.ticket}: {result.comment}")
-
-    mt5.shutdown()
+    reqs = [{
+        "action": mt5.TRADE_ACTION_REMOVE,
+        "order": order.ticket,
+        "symbol": symbol,
+        "magic": order.magic,
+        "comment": "Cancel Pending Order",
+    } for order in pending_orders]
+    results = send_orders_batch(reqs)
+    log_batch_results("Cancel pending", symbol, [o.ticket for o in pending_orders], results)
 
 # ----------------- Force Close Symbol (All Positions) -----------------
 def force_close_symbol(symbol: str):
-    if not mt5.initialize():
+    if not ensure_mt5():
         print("[DEBUG] MT5 init failed for force close")
         return
 
-    positions = mt5.positions_get(symbol=symbol) or []
-
-    tick = mt5.symbol_info_tick(symbol)
+    with mt5_lock:
+        positions = mt5.positions_get(symbol=symbol) or []
+        tick = mt5.symbol_info_tick(symbol)
     if not tick:
-        mt5.shutdown()
         return
 
+    reqs = []
     for pos in positions:
         close_type = mt5.ORDER_TYPE_SELL if pos.type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
         price = tick.bid if pos.type == mt5.ORDER_TYPE_BUY else tick.ask
-        req = {
+        reqs.append({
             "action": mt5.TRADE_ACTION_DEAL,
             "symbol": symbol,
             "volume": pos.volume,
@@ -105,16 +128,40 @@ def force_close_symbol(symbol: str):
             "magic": pos.magic,
             "comment": "Panic Close",
             "type_time": mt5.ORDER_TIME_GTC,
-        }
-        send_order_fast(req)
-
-    mt5.shutdown()
-    print(f"[INFO] All positions closed for {symbol}")
+        })
+    results = send_orders_batch(reqs)
+    log_batch_results("Force close", symbol, [p.ticket for p in positions], results)
+
+# ----------------- Symbol Form -----------------
+# (field, cast, default); a None default marks an optional field that is
+# stored as None when left blank
+SYMBOL_FORM_FIELDS = (
+    ("lot_size", float, 0.1),
+    ("brick_size", float, 1),
+    ("max_up", int, 2),
+    ("max_down", int, 2),
+    ("trade_side", str, "both"),
+    ("stop_loss_pips", float, None),
+    ("take_profit_pips", float, None),
+    ("trailing_stop_pips", float, None),
+)
+
+def parse_symbol_form(form) -> dict:
+    """Build a symbol config dict from the add-symbol form in one pass."""
+    get = form.get
+    cfg = {}
+    for name, cast, default in SYMBOL_FORM_FIELDS:
+        if default is None:
+            value = get(name)
+            cfg[name] = cast(value) if value else None
+        else:
+            cfg[name] = cast(get(name, default))
+    return cfg
 
 # ----------------- Routes -----------------
 @symbol_bp.route("/symbols", methods=["GET", "POST"])
 def symbols():
-    config = load_config()
+    config = load_config(for_update=request.method == "POST")
 
     if request.method == "POST":
         new_symbol = request.form.get("new_symbol", "").strip()
@@ -124,37 +171,18 @@ def symbols():
             config["symbols"].pop(remove_symbol)
 
         if new_symbol:
-            broker_symbols = fetch_broker_symbols()
-            if new_symbol not in broker_symbols:
+            if not validate_broker_symbol(new_symbol):
                 flash(f"Symbol '{new_symbol}' not found in broker Market Watch", "error")
                 return redirect("/symbols")
 
-            lot_size = float(request.form.get("lot_size", 0.1))
-            brick_size = float(request.form.get("brick_size", 1))
-            max_up = int(request.form.get("max_up", 2))
-            max_down = int(request.form.get("max_down", 2))
-            trade_side = request.form.get("trade_side", "both")
-            stop_loss_pips = float(request.form.get("stop_loss_pips")) if request.form.get("stop_loss_pips") else None
-            take_profit_pips = float(request.form.get("take_profit_pips")) if request.form.get("take_profit_pips") else None
-            trailing_stop_pips = float(request.form.get("trailing_stop_pips")) if request.form.get("trailing_stop_pips") else None
-
-            # ✅ Add farClose field from frontend (default False)
-            far_close = request.form.get("farClose", "false").lower() == "true"
+            sym_cfg = parse_symbol_form(request.form)
 
             prev_active = config["symbols"].get(new_symbol, {}).get("active", False)
+            sym_cfg["active"] = True if new_symbol not in config["symbols"] else prev_active
+            # ✅ farClose from frontend (default False)
+            sym_cfg["farClose"] = request.form.get("farClose", "false").lower() == "true"
 
-            config["symbols"][new_symbol] = {
-                "lot_size": lot_size,
-                "brick_size": brick_size,
-                "max_up": max_up,
-                "max_down": max_down,
-                "trade_side": trade_side,
-                "stop_loss_pips": stop_loss_pips,
-                "take_profit_pips": take_profit_pips,
-                "trailing_stop_pips": trailing_stop_pips,
-                "active": True if new_symbol not in config["symbols"] else prev_active,
-                "farClose": far_close   # ✅ Added here
-            }
+            config["symbols"][new_symbol] = sym_cfg
 
         save_config(config)
         return redirect("/symbols")
@@ -164,16 +192,20 @@ def symbols():
     return render_template("symbols.html", symbols=symbols_list, broker_symbols=broker_symbols)
 
 # ----------------- Toggle Active Status -----------------
+# the toggle endpoint only ever answers with one of these bodies
+_TOGGLE_BODY = {
+    True: dumps({"success": True, "active": True}),
+    False: dumps({"success": True, "active": False}),
+    None: dumps({"success": False, "message": "Symbol not found"}),
+}
+_NO_SYMBOL_BODY = dumps({"success": False, "message": "No symbol provided"})
+
 @symbol_bp.route("/symbols/toggle", methods=["POST"])
 def toggle_symbol():
-    config = load_config()
     data = request.get_json()
     symbol = data.get("symbol")
-    if symbol and symbol in config.get("symbols", {}):
-        config["symbols"][symbol]["active"] = not config["symbols"][symbol].get("active", False)
-        save_config(config)
-        return jsonify({"success": True, "active": config["symbols"][symbol]["active"]})
-    return jsonify({"success": False, "message": "Symbol not found"}), 404
+    active = toggle_symbol_active(symbol) if symbol else None
+    return json_response(_TOGGLE_BODY[active], status=200 if active is not None else 404)
 
 # ----------------- Close Pending Orders Route -----------------
 @symbol_bp.route("/symbols/close-pending", methods=["POST"])
@@ -181,13 +213,13 @@ def close_pending_route():
     data = request.get_json()
     symbol = data.get("symbol")
     if not symbol:
-        return jsonify({"success": False, "message": "No symbol provided"}), 400
+        return json_response(_NO_SYMBOL_BODY, status=400)
 
     try:
-        Thread(target=close_pending_orders, args=(symbol,), daemon=True).start()
-        return jsonify({"success": True, "message": f"Pending orders close started for {symbol}"})
+        submit_mt5_job(close_pending_orders, symbol)
+        return jsonify_fast({"success": True, "message": f"Pending orders close started for {symbol}"})
     except Exception as e:
-        return jsonify({"success": False, "message": str(e)}), 500
+        return jsonify_fast({"success": False, "message": str(e)}, status=500)
 
 # ----------------- Panic Close Route -----------------
 @symbol_bp.route("/symbols/panic-close", methods=["POST"])
@@ -195,10 +227,10 @@ def panic_close_route():
     data = request.get_json()
     symbol = data.get("symbol")
     if not symbol:
-        return jsonify({"success": False, "message": "No symbol provided"}), 400
+        return json_response(_NO_SYMBOL_BODY, status=400)
 
     try:
-        Thread(target=force_close_symbol, args=(symbol,), daemon=True).start()
-        return jsonify({"success": True, "message": f"Force close started for {symbol}"})
+        submit_mt5_job(force_close_symbol, symbol)
+        return jsonify_fast({"success": True, "message": f"Force close started for {symbol}"})
     except Exception as e:
-        return jsonify({"success": False, "message": str(e)}), 500
+        return jsonify_fast({"success": False, "message": str(e)}, status=500)
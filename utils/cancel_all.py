@@ -1,4 +1,6 @@
 import MetaTrader5 as mt5
+from utils.helpers import mt5_lock
+from utils.order_manager import DEFAULT_MAGIC, remove_orders
 
 # ----------------- Initialize MT5 -----------------
 def initialize_mt5(account=None, password=None, server=None):
@@ -13,49 +15,45 @@ def initialize_mt5(account=None, password=None, server=None):
     return True
 
 # ----------------- Cancel Pending Grid Orders -----------------
-def cancel_pending_grid_orders(magic_number=123456, symbols=None):
+PENDING_TYPES = frozenset({
+    mt5.ORDER_TYPE_BUY_STOP,
+    mt5.ORDER_TYPE_SELL_STOP,
+    mt5.ORDER_TYPE_BUY_LIMIT,
+    mt5.ORDER_TYPE_SELL_LIMIT,
+})
+
+def cancel_pending_grid_orders(magic_number=DEFAULT_MAGIC, symbols=None):
     """
     Cancels all pending orders placed by the bot (based on magic number).
     Optional: filter by symbols.
     """
-    if symbols:
-        orders = []
-        for symbol in symbols:
-            orders += mt5.orders_get(symbol=symbol) or []
-    else:
-        orders = mt5.orders_get() or []
+    with mt5_lock:
+        if symbols:
+            orders = []
+            for symbol in symbols:
+                orders += mt5.orders_get(symbol=symbol) or []
+        else:
+            orders = mt5.orders_get() or []
 
     if not orders:
         print("[INFO] No pending orders found.")
         return
 
-    canceled_count = 0
-    for order in orders:
-        if order.magic == magic_number and order.type in [
-            mt5.ORDER_TYPE_BUY_STOP,
-            mt5.ORDER_TYPE_SELL_STOP,
-            mt5.ORDER_TYPE_BUY_LIMIT,
-            mt5.ORDER_TYPE_SELL_LIMIT
-        ]:
-            # MT5 cancel pending order
-            request = {
-                "action": mt5.TRADE_ACTION_REMOVE,
-                "order": order.ticket,
-                "symbol": order.symbol,
-                "magic": order.magic,
-                "comment": "Cancel GridBot order"
-            }
-            result = mt5.order_send(request)
-            if result.retcode == mt5.TRADE_RETCODE_DONE:
-                print(f"[INFO] Cancelled order {order.ticket} ({order.symbol}) @ {order.price_open}")
-                canceled_count += 1
-            else:
-                print(f"[ERROR] Failed to cancel order {order.ticket} ({order.symbol}): {result.retcode}")
-    
+    # filter once up front, then only walk the bot's pending orders
+    grid_orders = [o for o in orders if o.magic == magic_number and o.type in PENDING_TYPES]
+
+    # remove_orders() sends the batch under mt5_lock, skips failed sends and
+    # drops the cached pending snapshots for the grid loop
+    canceled_count = remove_orders(grid_orders)
+    failed = len(grid_orders) - canceled_count
+    if failed:
+        print(f"[ERROR] Failed to cancel {failed} of {len(grid_orders)} pending grid orders")
+
     print(f"[INFO] Total pending grid orders cancelled: {canceled_count}")
 
 # ----------------- Run -----------------
-if initialize_mt5():
-    # Optional: pass a list of your grid symbols to limit cancellation
-    grid_symbols = ["GBPUSD", "EURUSD"]
-    cancel_pending_grid_orders(symbols=grid_symbols)
+if __name__ == "__main__":
+    if initialize_mt5():
+        # Optional: pass a list of your grid symbols to limit cancellation
+        grid_symbols = ["GBPUSD", "EURUSD"]
+        cancel_pending_grid_orders(symbols=grid_symbols)
@@ -1,57 +1,94 @@
 
 import MetaTrader5 as mt5
-import json
 import time  # ✅ ye add karo
 import traceback
+import heapq
+from operator import attrgetter
+from utils.config_cache import load_config
+from utils.mt5_session import ensure_mt5
+from utils.helpers import mt5_lock, log_batch_results, bump_orders_version
+
+_order_fields = attrgetter("type", "price_open", "ticket")
+CLEANER_MAX_INTERVAL = 5  # seconds; idle cleaner backs off up to this
+
 def remove_extra_pending_orders():
+    """Delete pending orders beyond max_up/max_down; returns how many were sent."""
     try:
-        with open("config.json") as f:
-            cfg = json.load(f)
+        cfg = load_config()
     except Exception:
         print("⚠️ Could not load config.json")
-        return
+        return 0
+
+    # 🔹 Only active symbols with farClose == true are cleaned
+    targets = {
+        symbol: sym_cfg for symbol, sym_cfg in cfg.get("symbols", {}).items()
+        if sym_cfg.get("active", False) and sym_cfg.get("farClose", False)
+    }
+    if not targets:
+        return 0
 
-    if not mt5.initialize():
+    if not ensure_mt5():
         print("⚠️ MT5 init failed")
-        return
+        return 0
 
-    for symbol, sym_cfg in cfg.get("symbols", {}).items():
-        # 🔹 Skip inactive symbols
-        if not sym_cfg.get("active", False):
-            continue
-
-        # 🔹 NEW CHECK: run only if farClose == true
-        if not sym_cfg.get("farClose", False):
-            continue
+    # one orders_get() for all symbols instead of one call per symbol
+    with mt5_lock:
+        all_orders = mt5.orders_get() or ()
+    by_symbol = {}
+    for o in all_orders:
+        if o.symbol in targets:
+            by_symbol.setdefault(o.symbol, []).append(o)
 
+    buy_stop, sell_stop = mt5.ORDER_TYPE_BUY_STOP, mt5.ORDER_TYPE_SELL_STOP
+    removed = 0
+    for symbol, orders in by_symbol.items():
+        sym_cfg = targets[symbol]
         max_up = int(sym_cfg.get("max_up", 0))
         max_down = int(sym_cfg.get("max_down", 0))
+        # nothing can be in excess
+        if len(orders) <= min(max_up, max_down):
+            continue
 
-        # ✅ Only if farClose true, perform cleaning
-        orders = mt5.orders_get(symbol=symbol)
-        if not orders:
+        # single pass; buy stops sit above price and sell stops below it,
+        # so the farthest buy is the highest price and the farthest sell the lowest
+        buys, sells = [], []
+        for o in orders:
+            otype, price, ticket = _order_fields(o)
+            if otype == buy_stop:
+                buys.append((price, ticket))
+            elif otype == sell_stop:
+                sells.append((-price, ticket))
+
+        # only pick the farthest excess orders instead of sorting them all
+        extra = []
+        if len(buys) > max_up:
+            extra += [t for _, t in heapq.nlargest(len(buys) - max_up, buys)]
+        if len(sells) > max_down:
+            extra += [t for _, t in heapq.nlargest(len(sells) - max_down, sells)]
+        if not extra:
             continue
 
-        buy_orders = [o for o in orders if o.type == mt5.ORDER_TYPE_BUY_STOP]
-        sell_orders = [o for o in orders if o.type == mt5.ORDER_TYPE_SELL_STOP]
-
-        if len(buy_orders) > max_up:
-            # sort descending price (remove farthest)
-            buy_orders_sorted = sorted(buy_orders, key=lambda x: x.price_open, reverse=True)
-            for o in buy_orders_sorted[max_up:]:
-                mt5.order_delete(o.ticket)
-                print(f"[{symbol}] Removed extra BUY_STOP {o.ticket}")
-
-        if len(sell_orders) > max_down:
-            # sort ascending price (remove farthest)
-            sell_orders_sorted = sorted(sell_orders, key=lambda x: x.price_open)
-            for o in sell_orders_sorted[max_down:]:
-                mt5.order_delete(o.ticket)
-                print(f"[{symbol}] Removed extra SELL_STOP {o.ticket}")
+        # submit the removals back-to-back, report them in one line
+        with mt5_lock:
+            results = [
+                mt5.order_send({"action": mt5.TRADE_ACTION_REMOVE, "order": ticket})
+                for ticket in extra
+            ]
+        removed += len(results)
+        ok, _ = log_batch_results("Removed extra stops", symbol, extra, results)
+        if ok:
+            bump_orders_version()
+    return removed
+
 def run_auto_cleaner(interval: int = 10):
+    """Clean every interval seconds while there is work, backing off when idle."""
+    delay = interval
     while True:
         try:
-            remove_extra_pending_orders()
+            removed = remove_extra_pending_orders()
         except Exception as e:
             print("Cleaner error:", e)
-        time.sleep(interval)
\ No newline at end of file
+            removed = 0
+        # idle passes double the delay up to CLEANER_MAX_INTERVAL; any removal resets it
+        delay = interval if removed else min(delay * 2, max(interval, CLEANER_MAX_INTERVAL))
+        time.sleep(delay)
@@ -0,0 +1,135 @@
+# utils/config_cache.py — Process-wide cached access to config.json
+
+import os
+import time
+import atexit
+import threading
+from copy import deepcopy
+
+from utils.fastjson import load_file, dumps_config
+
+CONFIG_FILE = "config.json"
+CONFIG_SAVE_DELAY = 0.1  # seconds; saves within this window coalesce into one write
+
+_config_lock = threading.Lock()
+_cfg_cache = {"key": None, "data": None}
+_saved_cfg = {"key": None, "bytes": None}
+_pending = {"data": None}  # latest config queued by save_config(), not yet on disk
+_dirty = threading.Event()
+_writer_thread = None
+_update_lock = threading.RLock()  # serializes read-modify-save in update_symbol()
+
+def _config_key():
+    try:
+        st = os.stat(CONFIG_FILE)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+# ----------------- Load -----------------
+def load_config(for_update=False):
+    """Return parsed config.json, re-parsing only when the file changed on disk.
+
+    The cached dict is shared between callers; pass for_update=True to get a
+    private copy that is safe to mutate before save_config().
+    """
+    with _config_lock:
+        if _pending["data"] is not None:
+            # a queued save is newer than the file on disk
+            data = _pending["data"]
+            return deepcopy(data) if for_update else data
+        key = _config_key()
+        if key is None:
+            raise FileNotFoundError(CONFIG_FILE)
+        if key != _cfg_cache["key"]:
+            _cfg_cache["data"] = load_file(CONFIG_FILE)
+            _cfg_cache["key"] = key
+        data = _cfg_cache["data"]
+    return deepcopy(data) if for_update else data
+
+# ----------------- Save -----------------
+def _write_locked(config):
+    """Atomically replace config.json (caller holds _config_lock)."""
+    data = dumps_config(config)
+    key = _config_key()
+    if key is not None and (
+        (key == _cfg_cache["key"] and config == _cfg_cache["data"])
+        or (key == _saved_cfg["key"] and data == _saved_cfg["bytes"])
+    ):
+        return False
+    tmp = CONFIG_FILE + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, CONFIG_FILE)
+    key = _config_key()
+    _saved_cfg["key"] = key
+    _saved_cfg["bytes"] = data
+    # what we just wrote is the new parsed state; no need to re-read it. Cache a
+    # copy: the caller may still hold config and mutate it before its next save,
+    # which would otherwise compare equal to the cache above and be skipped
+    _cfg_cache["key"] = key
+    _cfg_cache["data"] = deepcopy(config)
+    return True
+
+def flush_config():
+    """Write any queued config now. Returns True if the file was written."""
+    with _config_lock:
+        config = _pending["data"]
+        if config is None:
+            return False
+        _pending["data"] = None
+        return _write_locked(config)
+
+def _writer_loop():
+    while True:
+        _dirty.wait()
+        time.sleep(CONFIG_SAVE_DELAY)
+        _dirty.clear()
+        try:
+            flush_config()
+        except Exception as e:
+            print("[ERROR] config writer:", e)
+
+def save_config(config):
+    """Queue config for writing by the background writer.
+
+    Bursts of saves (e.g. toggle spam) within CONFIG_SAVE_DELAY collapse
+    into one fsync'd write. load_config() returns the queued config until
+    it is on disk. The caller must not mutate config after handing it over.
+    """
+    global _writer_thread
+    with _config_lock:
+        _pending["data"] = config
+        if _writer_thread is None:
+            _writer_thread = threading.Thread(target=_writer_loop, daemon=True)
+            _writer_thread.start()
+    _dirty.set()
+
+def update_symbol(symbol, **changes):
+    """Apply changes to one symbol's config in memory and queue the save.
+
+    Copy-on-write: only the top-level dict, the symbols dict and the one
+    symbol entry are copied, not the whole config. Returns the updated
+    symbol dict, or None if the symbol is not configured.
+    """
+    with _update_lock:
+        config = load_config()
+        symbols = config.get("symbols", {})
+        sym_cfg = symbols.get(symbol)
+        if sym_cfg is None:
+            return None
+        new_sym = {**sym_cfg, **changes}
+        save_config({**config, "symbols": {**symbols, symbol: new_sym}})
+    return new_sym
+
+def toggle_symbol_active(symbol):
+    """Flip a symbol's "active" flag; returns the new value or None if unknown."""
+    with _update_lock:
+        sym_cfg = load_config().get("symbols", {}).get(symbol)
+        if sym_cfg is None:
+            return None
+        return update_symbol(symbol, active=not sym_cfg.get("active", False))["active"]
+
+atexit.register(flush_config)
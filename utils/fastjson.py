@@ -0,0 +1,58 @@
+# utils/fastjson.py — orjson-backed JSON helpers (falls back to stdlib json)
+
+import json
+import os
+import dataclasses
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# ----------------- Parse -----------------
+def loads(data):
+    """Parse JSON from str/bytes."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+def load_file(path):
+    """Parse a JSON file with one unbuffered read sized from fstat."""
+    with open(path, "rb", buffering=0) as f:
+        size = os.fstat(f.fileno()).st_size
+        data = f.read(size + 1)  # +1 picks up bytes appended since fstat
+        if len(data) > size:
+            data += f.read()
+    return loads(data)
+
+# ----------------- Serialize -----------------
+def _default(obj):
+    # orjson handles dataclasses natively; stdlib json needs a hand
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(obj) -> bytes:
+    """Compact JSON as bytes (used for HTTP responses)."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), default=_default).encode()
+
+def dumps_config(config) -> bytes:
+    """Compact JSON bytes for config.json (machine-read; use pretty_config() to inspect)."""
+    if orjson is not None:
+        return orjson.dumps(config)
+    return json.dumps(config, separators=(",", ":"), ensure_ascii=False).encode()
+
+def pretty_config(config) -> str:
+    """Human-readable rendering of a config, generated on demand."""
+    return json.dumps(config, indent=4, ensure_ascii=False)
+
+def json_response(body: bytes, status=200):
+    """Response for an already-serialized JSON body (e.g. a precomputed constant)."""
+    from flask import current_app
+    return current_app.response_class(body, status=status, mimetype="application/json")
+
+def jsonify_fast(obj, status=200):
+    """Drop-in for flask.jsonify that serializes with orjson."""
+    return json_response(dumps(obj), status=status)
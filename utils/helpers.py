@@ -2,12 +2,81 @@
 
 import MetaTrader5 as mt5
 import math
+import time
 import traceback
+from threading import RLock
+
+# ----------------- Shared MT5 lock -----------------
+# The MetaTrader5 binding is not safe to call concurrently; the grid bot,
+# trailing loop and Flask routes all serialize their MT5 calls on this lock.
+mt5_lock = RLock()
+
+# ----------------- Symbol Specs Cache -----------------
+# digits/point never change intraday; caching them turns a symbol_info()
+# IPC call per price operation into a dict lookup. (Re)connecting and config
+# reloads clear the cache, so the TTL only has to catch a broker changing
+# stops_level mid-session.
+SYMBOL_SPEC_TTL = 3600  # seconds
+_symbol_specs = {}  # symbol -> (fetched_at, digits, point, stops_level); point None if unknown
+
+def _load_spec(symbol):
+    """Cached spec tuple for symbol, or None if symbol_info() is unavailable."""
+    now = time.monotonic()
+    spec = _symbol_specs.get(symbol)
+    if spec is not None and now - spec[0] < SYMBOL_SPEC_TTL:
+        return spec
+    with mt5_lock:
+        info = mt5.symbol_info(symbol)
+    if not info:
+        # don't cache a miss; the symbol may just not be selected yet
+        return None
+    return seed_symbol_spec(symbol, info, now)
+
+def seed_symbol_spec(symbol, info, now=None):
+    """Cache specs from a symbol_info() result the caller already fetched; returns the spec tuple."""
+    spec = (time.monotonic() if now is None else now, getattr(info, "digits", 5),
+            getattr(info, "point", None), getattr(info, "trade_stops_level", 0) or 0)
+    _symbol_specs[symbol] = spec
+    return spec
+
+def symbol_spec(symbol):
+    """Return (digits, point) for symbol, refreshed every SYMBOL_SPEC_TTL seconds."""
+    spec = _load_spec(symbol)
+    if spec is None:
+        return 5, None
+    return spec[1], spec[2]
+
+def symbol_stops_level(symbol):
+    """Broker minimum stop distance for symbol in points (0 if unknown), cached like symbol_spec()."""
+    spec = _load_spec(symbol)
+    return spec[3] if spec is not None else 0
+
+def refresh_symbol_info(symbol=None):
+    """Drop cached specs for one symbol, or all of them (e.g. after (re)connecting or a config reload)."""
+    if symbol is None:
+        _symbol_specs.clear()
+    else:
+        _symbol_specs.pop(symbol, None)
+
+# ----------------- Rate-limited Tracebacks -----------------
+# A flapping error (e.g. MT5 disconnect) would otherwise print a full stack
+# trace from every symbol thread on every tick.
+TRACEBACK_INTERVAL = 30  # seconds between full tracebacks per exception type
+_last_traceback = {}  # exception class name -> monotonic time of last full traceback
+
+def print_exc_limited(where, e):
+    """traceback.print_exc() at most once per TRACEBACK_INTERVAL per exception type; a one-liner otherwise."""
+    key = type(e).__name__
+    now = time.monotonic()
+    if now - _last_traceback.get(key, -TRACEBACK_INTERVAL) >= TRACEBACK_INTERVAL:
+        _last_traceback[key] = now
+        traceback.print_exc()
+    else:
+        print(f"[ERROR] {where}: {key}: {e}")
 
 # ----------------- Precision & Rounding -----------------
 def symbol_precision(symbol):
-    info = mt5.symbol_info(symbol)
-    return getattr(info, "digits", 5) if info else 5
+    return symbol_spec(symbol)[0]
 
 def round_price(symbol, price):
     """Round price to instrument precision (uses symbol precision)."""
@@ -20,10 +89,8 @@ def round_price(symbol, price):
         return price
 
 def get_point(symbol):
-    info = mt5.symbol_info(symbol)
-    if not info:
-        return 10 ** (-symbol_precision(symbol))
-    return getattr(info, "point", 10 ** (-symbol_precision(symbol)))
+    digits, point = symbol_spec(symbol)
+    return point if point is not None else 10 ** (-digits)
 
 def get_tick(symbol):
     """Ensure symbol is selected and return latest tick."""
@@ -49,6 +116,123 @@ def fetch_positions(symbol):
     except Exception:
         return []
 
+# Our own order_send calls are what change pending orders, so a short-lived
+# cache is safe as long as every successful send bumps the version. The cached
+# fetchers take mt5_lock themselves, only on a miss: a hit never waits behind
+# another thread's order batch.
+PENDING_CACHE_TTL = 0.1  # seconds
+_orders_version = 0
+_pending_orders_cache = {}  # symbol -> (version, fetched_at, orders tuple)
+
+def bump_orders_version():
+    """Invalidate every cached pending-order list (call after a successful order_send)."""
+    global _orders_version
+    _orders_version += 1
+
+def fetch_pending_orders_cached(symbol, max_age=PENDING_CACHE_TTL):
+    """fetch_pending_orders(), reused for max_age seconds unless orders were sent since.
+
+    max_age=0 always fetches, but still stores the result for later cached readers.
+    """
+    now = time.monotonic()
+    entry = _pending_orders_cache.get(symbol)
+    if entry is not None and entry[0] == _orders_version and now - entry[1] < max_age:
+        return entry[2]
+    version = _orders_version
+    with mt5_lock:
+        orders = tuple(fetch_pending_orders(symbol))
+    _pending_orders_cache[symbol] = (version, now, orders)
+    return orders
+
+# The grid loop and the trailing loop both read every active symbol's
+# positions; sharing one short-lived, version-checked copy lets a single
+# positions_get() serve whichever loop asks second.
+_positions_cache = {}  # symbol -> (version, fetched_at, positions tuple)
+
+def fetch_positions_cached(symbol):
+    """fetch_positions(), reused for PENDING_CACHE_TTL unless orders were sent since."""
+    now = time.monotonic()
+    entry = _positions_cache.get(symbol)
+    if entry is not None and entry[0] == _orders_version and now - entry[1] < PENDING_CACHE_TTL:
+        return entry[2]
+    version = _orders_version
+    with mt5_lock:
+        positions = tuple(fetch_positions(symbol))
+    _positions_cache[symbol] = (version, now, positions)
+    return positions
+
+# ----------------- Order Sending -----------------
+FILLING_MODES = (mt5.ORDER_FILLING_RETURN, mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_IOC)
+_filling_order = {}  # symbol -> FILLING_MODES reordered with the last successful mode first
+
+def _initial_filling_order(symbol):
+    """Seed a symbol's filling order from symbol_info().filling_mode (bit 1 = FOK, bit 2 = IOC)."""
+    try:
+        with mt5_lock:
+            info = mt5.symbol_info(symbol)
+        mode = int(getattr(info, "filling_mode", 0) or 0)
+        if info:
+            seed_symbol_spec(symbol, info)
+    except Exception:
+        return FILLING_MODES
+    if mode & 1:
+        first = mt5.ORDER_FILLING_FOK
+    elif mode & 2:
+        first = mt5.ORDER_FILLING_IOC
+    else:
+        first = mt5.ORDER_FILLING_RETURN
+    order = (first, *(m for m in FILLING_MODES if m != first))
+    _filling_order[symbol] = order
+    return order
+
+def send_order_fast(request):
+    """Send request, trying the symbol's last successful filling mode first.
+
+    A symbol's first deal probes symbol_info().filling_mode once to pick a
+    supported mode; the rest are still tried as fallbacks and whichever
+    fills is remembered, so orders usually need a single order_send(). The
+    caller's dict is left untouched. Returns the last result, which is None
+    if every attempt failed at the IPC level.
+    """
+    symbol = request.get("symbol")
+    is_deal = symbol is not None and request.get("action") == mt5.TRADE_ACTION_DEAL
+    modes = _filling_order.get(symbol)
+    if modes is None:
+        # only deals care about the filling mode; removals go out with the default order
+        modes = _initial_filling_order(symbol) if is_deal else FILLING_MODES
+    order_send, done_code = mt5.order_send, mt5.TRADE_RETCODE_DONE
+    result = None
+    for filling in modes:
+        try:
+            with mt5_lock:
+                result = order_send({**request, "type_filling": filling})
+        except Exception as e:
+            print(f"[ERROR] order_send raised for {symbol}: {e}")
+            result = None
+            continue
+        if result is not None and result.retcode == done_code:
+            bump_orders_version()
+            # removals succeed with any mode, so only deals teach us the symbol's mode
+            if is_deal:
+                _filling_order[symbol] = (filling, *(m for m in FILLING_MODES if m != filling))
+            return result
+    return result
+
+def log_batch_results(label, symbol, tickets, results):
+    """Print one summary line for a batch of sends instead of a line per order.
+
+    Failures are listed as ticket:retcode in the same line. Returns (ok, failed).
+    """
+    done = mt5.TRADE_RETCODE_DONE
+    failed = [(t, getattr(r, "retcode", None)) for t, r in zip(tickets, results)
+              if r is None or r.retcode != done]
+    ok = len(results) - len(failed)
+    line = f"[INFO] {label} {symbol}: ok={ok} fail={len(failed)}"
+    if failed:
+        line += " failed=" + ", ".join(f"{t}:{code}" for t, code in failed)
+    print(line)
+    return ok, len(failed)
+
 # ----------------- Grid Alignment -----------------
 def align_price_to_grid(price, brick_size, mode="nearest"):
     """Align numeric price to brick_size multiples."""
@@ -72,11 +256,15 @@ def align_price_to_grid_symbol(symbol, price, brick_size, mode="nearest"):
     return round_price(symbol, aligned)
 
 # ----------------- Position Helpers -----------------
+# resolved once at import; the comprehensions below would otherwise look them up per position
+_POS_BUY_TYPES = frozenset((0, getattr(mt5, "ORDER_TYPE_BUY", 0)))
+_POS_SELL_TYPES = frozenset((1, getattr(mt5, "ORDER_TYPE_SELL", 1)))
+
 def highest_buy_position(symbol):
     """Return highest price_open among current buy positions."""
     try:
         positions = fetch_positions(symbol)
-        buys = [p.price_open for p in positions if int(p.type) in (0, getattr(mt5, "ORDER_TYPE_BUY", 0))]
+        buys = [p.price_open for p in positions if int(p.type) in _POS_BUY_TYPES]
         return max(buys) if buys else None
     except Exception:
         return None
@@ -85,7 +273,7 @@ def lowest_sell_position(symbol):
     """Return lowest price_open among current sell positions."""
     try:
         positions = fetch_positions(symbol)
-        sells = [p.price_open for p in positions if int(p.type) in (1, getattr(mt5, "ORDER_TYPE_SELL", 1))]
+        sells = [p.price_open for p in positions if int(p.type) in _POS_SELL_TYPES]
         return min(sells) if sells else None
     except Exception:
         return None
@@ -1,39 +1,41 @@
 from flask import Blueprint, render_template, redirect, url_for
 import MetaTrader5 as mt5
-import json
 import threading
+from operator import attrgetter
 from utils.utils import run_dynamic_grid  # your existing grid strategy
+from utils.config_cache import load_config
 
 main_bp = Blueprint("main", __name__)
-CONFIG_FILE = "config.json"
-
-# ----------------- Config Helpers -----------------
-def load_config():
-    with open(CONFIG_FILE) as f:
-        return json.load(f)
 
 # ----------------- MT5 Helpers (same as before) -----------------
+# one dict per row: index.html iterates positions/orders row by row.
+# MT5 TradePosition/TradeOrder are namedtuples, so these fields always exist
+_position_fields = attrgetter("symbol", "volume", "type", "price_open", "profit", "ticket")
+_order_fields = attrgetter("symbol", "volume_initial", "volume_current", "type", "price_open", "ticket")
+
 def get_positions():
     positions = mt5.positions_get() or []
+    buy = mt5.ORDER_TYPE_BUY
     return [{
-        "symbol": p.symbol,
-        "volume": p.volume,
-        "type": "BUY" if p.type == mt5.ORDER_TYPE_BUY else "SELL",
-        "price_open": p.price_open,
-        "profit": getattr(p, "profit", 0),
-        "ticket": p.ticket
-    } for p in positions]
+        "symbol": symbol,
+        "volume": volume,
+        "type": "BUY" if typ == buy else "SELL",
+        "price_open": price_open,
+        "profit": profit,
+        "ticket": ticket
+    } for symbol, volume, typ, price_open, profit, ticket in map(_position_fields, positions)]
 
 def get_orders():
     orders = mt5.orders_get() or []
+    buy = mt5.ORDER_TYPE_BUY
     return [{
-        "symbol": o.symbol,
-        "volume": getattr(o, "volume_initial", 0),
-        "remaining": getattr(o, "volume_current", 0),
-        "type": "BUY" if o.type == mt5.ORDER_TYPE_BUY else "SELL",
-        "price_open": getattr(o, "price_open", None),
-        "ticket": o.ticket
-    } for o in orders]
+        "symbol": symbol,
+        "volume": volume,
+        "remaining": remaining,
+        "type": "BUY" if typ == buy else "SELL",
+        "price_open": price_open,
+        "ticket": ticket
+    } for symbol, volume, remaining, typ, price_open, ticket in map(_order_fields, orders)]
 
 def get_grid_data():
     cfg = load_config()
@@ -0,0 +1,122 @@
+# utils/mt5_session.py — One persistent MT5 terminal session per process
+
+import atexit
+import queue
+import threading
+import time
+from concurrent.futures import Future
+import MetaTrader5 as mt5
+
+from utils.helpers import mt5_lock, refresh_symbol_info
+
+MT5_IPC_ERRORS = range(-10005, -10000)  # RES_E_INTERNAL_FAIL_* (IPC send/recv/init/timeout)
+
+_mt5_ready = threading.Event()
+_mt5_init_lock = threading.Lock()
+
+MT5_HEARTBEAT_INTERVAL = 25  # seconds between idle link checks
+
+def ensure_mt5():
+    """Initialize MT5 once; later calls are a flag check until the link drops."""
+    if _mt5_ready.is_set():
+        return True
+    with _mt5_init_lock:
+        if not _mt5_ready.is_set():
+            print("[DEBUG] Initializing MT5...")
+            with mt5_lock:
+                ok = mt5.initialize()
+                err = None if ok else mt5.last_error()
+            if ok:
+                refresh_symbol_info()
+                _mt5_ready.set()
+                _start_heartbeat()
+            else:
+                print("[ERROR] MT5 initialization failed:", err)
+    return _mt5_ready.is_set()
+
+def check_mt5_connection():
+    """Force re-init on the next ensure_mt5() if the last MT5 call failed at IPC level."""
+    try:
+        with mt5_lock:
+            code = mt5.last_error()[0]
+    except Exception:
+        return
+    if code in MT5_IPC_ERRORS:
+        print("[WARN] MT5 connection lost:", code)
+        _mt5_ready.clear()
+
+def mark_mt5_ready():
+    """Record a connection established elsewhere (e.g. initialize + login)."""
+    refresh_symbol_info()
+    _mt5_ready.set()
+    _start_heartbeat()
+
+# ----------------- Link heartbeat -----------------
+# The terminal pipe can drop while the bot sits idle (weekend, paused grid);
+# without a probe the first order afterwards is what finds out, and pays the
+# failed call plus the re-init. A cheap terminal_info() every
+# MT5_HEARTBEAT_INTERVAL seconds notices first and marks the link down, so
+# the next ensure_mt5() (the far-order cleaner calls it every few seconds)
+# reconnects before a trade needs the link.
+_heartbeat = None
+_heartbeat_lock = threading.Lock()
+
+def _heartbeat_loop():
+    while True:
+        time.sleep(MT5_HEARTBEAT_INTERVAL)
+        if not _mt5_ready.is_set():
+            continue
+        try:
+            with mt5_lock:
+                info = mt5.terminal_info()
+        except Exception:
+            info = None
+        if info is None:
+            check_mt5_connection()
+
+def _start_heartbeat():
+    """Start the heartbeat thread once, on the first successful connection."""
+    global _heartbeat
+    with _heartbeat_lock:
+        if _heartbeat is None:
+            _heartbeat = threading.Thread(target=_heartbeat_loop, daemon=True)
+            _heartbeat.start()
+
+# ----------------- Background MT5 jobs -----------------
+# Slow MT5 work triggered from HTTP handlers (panic close, cancel pending)
+# runs on one dispatcher thread fed by a queue: jobs execute in submission
+# order, a burst of clicks cannot pile up threads all contending for
+# mt5_lock, and callers get a Future to wait on if they need the outcome.
+_jobs = queue.Queue()
+_job_worker = None
+_job_worker_lock = threading.Lock()
+
+def _job_loop():
+    while True:
+        future, fn, args = _jobs.get()
+        try:
+            if future.set_running_or_notify_cancel():
+                future.set_result(fn(*args))
+        except Exception as e:
+            print(f"[ERROR] MT5 job {getattr(fn, '__name__', fn)} failed:", e)
+            future.set_exception(e)
+        finally:
+            _jobs.task_done()
+
+def submit_mt5_job(fn, *args):
+    """Queue fn(*args) for the MT5 dispatcher thread (started on first use); returns a Future."""
+    global _job_worker
+    with _job_worker_lock:
+        if _job_worker is None:
+            _job_worker = threading.Thread(target=_job_loop, daemon=True)
+            _job_worker.start()
+    future = Future()
+    _jobs.put((future, fn, args))
+    return future
+
+def _shutdown():
+    if _mt5_ready.is_set():
+        with mt5_lock:
+            mt5.shutdown()
+
+atexit.register(_shutdown)
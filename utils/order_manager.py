@@ -1,126 +1,236 @@
 import MetaTrader5 as mt5
-import traceback
-from utils.helpers import round_price, fetch_pending_orders, fetch_positions, symbol_precision
+import time
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+from utils.helpers import (
+    round_price, fetch_pending_orders_cached, fetch_positions, symbol_precision, symbol_spec, mt5_lock,
+    bump_orders_version, print_exc_limited
+)
 
 DEFAULT_MAGIC = 123456
 MAX_ORDERS_PER_SYMBOL = 60
+_price_open = attrgetter("price_open")
+_type_price = attrgetter("type", "price_open")
+
+# ----------------- Pending Order Snapshot -----------------
+PENDING_INDEX_TTL = 0.25  # seconds
+# symbol -> {"t", "orders", "count", "index": {(order_type, rounded_price): ticket}, "stops"}
+_pending_index = {}
+
+def _snapshot_entry(symbol, ttl=PENDING_INDEX_TTL):
+    now = time.monotonic()
+    entry = _pending_index.get(symbol)
+    if entry is not None and now - entry["t"] < ttl:
+        return entry
+    digits = symbol_precision(symbol)
+    orders = fetch_pending_orders_cached(symbol)
+    entry = {
+        "t": now,
+        "orders": orders,
+        "count": len(orders),  # includes orders we placed since the fetch
+        "index": {(int(o.type), round(o.price_open, digits)): o.ticket for o in orders},
+        "stops": None,  # built on first use by _sorted_stops()
+    }
+    _pending_index[symbol] = entry
+    return entry
+
+def _pending_snapshot(symbol, ttl=PENDING_INDEX_TTL):
+    """(orders, index) for the symbol's pending orders, rebuilt at most every ttl seconds.
+
+    index maps (order_type, rounded price) -> ticket, so count and duplicate
+    checks both come from one fetch.
+    """
+    entry = _snapshot_entry(symbol, ttl)
+    return entry["orders"], entry["index"]
+
+def _sorted_stops(symbol):
+    """(buy_stops, buy_prices, sell_stops, sell_prices), each sorted by price_open ascending."""
+    entry = _snapshot_entry(symbol)
+    if entry["stops"] is None:
+        buy_stop, sell_stop = mt5.ORDER_TYPE_BUY_STOP, mt5.ORDER_TYPE_SELL_STOP
+        by_price = sorted(entry["orders"], key=_price_open)
+        buys = [o for o in by_price if o.type == buy_stop]
+        sells = [o for o in by_price if o.type == sell_stop]
+        entry["stops"] = (buys, [o.price_open for o in buys], sells, [o.price_open for o in sells])
+    return entry["stops"]
+
+def invalidate_pending_index(symbol):
+    """Forget cached pending orders after our own order_send changed the symbol's orders."""
+    _pending_index.pop(symbol, None)
+    bump_orders_version()
+
+def _record_placed(symbol, order_type, price, ticket):
+    """Add an order we just placed to the snapshot instead of dropping it.
+
+    The next order of a grid batch then checks its count and duplicates
+    without another orders_get() round trip. orders/stops are left as
+    fetched; the snapshot still expires after PENDING_INDEX_TTL.
+    """
+    entry = _pending_index.get(symbol)
+    if entry is not None:
+        entry["index"][(order_type, price)] = ticket
+        entry["count"] += 1
+    bump_orders_version()
 
 # ----------------- Check & Exists -----------------
 def order_exists(symbol, price, order_type):
     try:
-        price = round_price(symbol, price)
-        for o in fetch_pending_orders(symbol):
-            if int(o.type) == int(order_type) and round_price(symbol, o.price_open) == price:
-                return True
+        return (int(order_type), round_price(symbol, price)) in _pending_snapshot(symbol)[1]
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"order_exists({symbol})", e)
     return False
 
 def can_place_order(symbol):
     try:
-        pending = fetch_pending_orders(symbol)
-        if len(pending) >= MAX_ORDERS_PER_SYMBOL:
-            return False
-        return True
+        return _snapshot_entry(symbol)["count"] < MAX_ORDERS_PER_SYMBOL
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"can_place_order({symbol})", e)
         return False
 
 # ----------------- Place / Remove -----------------
-def place_order(order_type, symbol, price, lot, magic=DEFAULT_MAGIC, sl_pips=None, tp_pips=None):
-    try:
-        if not can_place_order(symbol):
-            return None
+# constant request fields; each call copies a template and fills in the rest
+_PLACE_TMPL = {
+    "action": mt5.TRADE_ACTION_PENDING,
+    "deviation": 10,
+    "comment": "GridBot",
+    "type_filling": mt5.ORDER_FILLING_RETURN,
+}
+_REMOVE_TMPL = {"action": mt5.TRADE_ACTION_REMOVE, "comment": "GridBot cancel"}
 
-        price = round_price(symbol, price)
+def make_placer(symbol, order_type, magic=DEFAULT_MAGIC, sl_pips=None, tp_pips=None):
+    """Return place(price, lot) specialized for one symbol/type/magic/SL/TP combination.
 
-        if order_exists(symbol, price, order_type):
-            return None
+    The base request, the sign of the SL/TP offsets and the symbol's digits
+    are fixed once, so a grid loop only pays for rounding the price, the
+    snapshot lookup and the order_send() itself.
+    """
+    order_type = int(order_type)
+    digits = symbol_precision(symbol)
+    base = {**_PLACE_TMPL, "symbol": symbol, "type": order_type, "magic": int(magic)}
+    # buy stops keep SL below and TP above the entry; sell stops the reverse
+    sign = 1 if order_type == mt5.ORDER_TYPE_BUY_STOP else -1
+    sl_off = None if sl_pips is None else -sign * sl_pips
+    tp_off = None if tp_pips is None else sign * tp_pips
+    done_code = mt5.TRADE_RETCODE_DONE
+
+    def place(price, lot):
+        try:
+            # count limit and duplicate check from one snapshot
+            entry = _snapshot_entry(symbol)
+            if entry["count"] >= MAX_ORDERS_PER_SYMBOL:
+                return None
+            index = entry["index"]
+
+            price = round(price, digits)
+            if (order_type, price) in index:
+                return None
+
+            request = {**base, "volume": lot, "price": price}
+            if sl_off is not None:
+                sl = round(price + sl_off, digits)
+                if sl: request["sl"] = sl
+            if tp_off is not None:
+                tp = round(price + tp_off, digits)
+                if tp: request["tp"] = tp
 
-        sl, tp = None, None
-        if sl_pips is not None:
-            sl = round_price(symbol, price - sl_pips) if order_type == mt5.ORDER_TYPE_BUY_STOP else round_price(symbol, price + sl_pips)
-        if tp_pips is not None:
-            tp = round_price(symbol, price + tp_pips) if order_type == mt5.ORDER_TYPE_BUY_STOP else round_price(symbol, price - tp_pips)
-
-        request = {
-            "action": mt5.TRADE_ACTION_PENDING,
-            "symbol": symbol,
-            "volume": lot,
-            "type": order_type,
-            "price": price,
-            "deviation": 10,
-            "magic": int(magic),
-            "comment": "GridBot",
-            "type_filling": mt5.ORDER_FILLING_RETURN,
-        }
-        if sl: request["sl"] = sl
-        if tp: request["tp"] = tp
-
-        result = mt5.order_send(request)
-        if not result or getattr(result, "retcode", None) != mt5.TRADE_RETCODE_DONE:
+            result = mt5.order_send(request)
+            if not result or getattr(result, "retcode", None) != done_code:
+                return None
+
+            _record_placed(symbol, order_type, price, getattr(result, "order", None))
+            return result
+        except Exception as e:
+            print_exc_limited(f"place({symbol})", e)
             return None
 
-        return result
-    except Exception as e:
-        traceback.print_exc()
-        return None
+    return place
+
+_placers = {}  # (symbol, order_type, magic, sl_pips, tp_pips) -> make_placer() closure
+
+def place_order(order_type, symbol, price, lot, magic=DEFAULT_MAGIC, sl_pips=None, tp_pips=None):
+    key = (symbol, int(order_type), int(magic), sl_pips, tp_pips)
+    placer = _placers.get(key)
+    if placer is None:
+        try:
+            placer = make_placer(symbol, order_type, magic, sl_pips, tp_pips)
+        except Exception as e:
+            print_exc_limited(f"place_order({symbol})", e)
+            return None
+        # keep it only if digits came from the broker, not the unselected-symbol fallback
+        if symbol_spec(symbol)[1] is not None:
+            _placers[key] = placer
+    return placer(price, lot)
 
 def remove_order(order):
     try:
-        req = {
-            "action": mt5.TRADE_ACTION_REMOVE,
-            "order": int(order.ticket),
-            "symbol": order.symbol,
-            "magic": getattr(order, "magic", DEFAULT_MAGIC),
-            "comment": "GridBot cancel",
-        }
+        req = _REMOVE_TMPL.copy()
+        req.update(order=int(order.ticket), symbol=order.symbol, magic=getattr(order, "magic", DEFAULT_MAGIC))
         res = mt5.order_send(req)
         if not res or getattr(res, "retcode", None) != mt5.TRADE_RETCODE_DONE:
             return None
+        invalidate_pending_index(order.symbol)
         return res
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"remove_order({getattr(order, 'symbol', None)})", e)
         return None
 
+def remove_orders(orders):
+    """Cancel several pending orders back-to-back; returns how many succeeded.
+
+    One reusable request dict (order_send copies what it needs) and one
+    mt5_lock hold for the whole batch, so no other thread's MT5 calls are
+    interleaved between the cancels.
+    """
+    req = _REMOVE_TMPL.copy()
+    done = 0
+    order_send, done_code = mt5.order_send, mt5.TRADE_RETCODE_DONE
+    with mt5_lock:
+        for o in orders:
+            req["order"] = int(o.ticket)
+            req["symbol"] = o.symbol
+            req["magic"] = getattr(o, "magic", DEFAULT_MAGIC)
+            try:
+                res = order_send(req)
+            except Exception as e:
+                print_exc_limited(f"remove_orders({o.symbol})", e)
+                continue
+            if res and getattr(res, "retcode", None) == done_code:
+                done += 1
+                invalidate_pending_index(o.symbol)
+    return done
+
 # ----------------- Cancel Orders -----------------
 def cancel_far_orders(symbol, current_price, brick_size, max_up, max_down):
     try:
         upper_limit = current_price + brick_size * max_up
         lower_limit = current_price - brick_size * max_down
-        for o in fetch_pending_orders(symbol):
-            try:
-                price_open = getattr(o, "price_open", None)
-                if price_open is None:
-                    continue
-                if int(o.type) == mt5.ORDER_TYPE_BUY_STOP and price_open > upper_limit:
-                    remove_order(o)
-                elif int(o.type) == mt5.ORDER_TYPE_SELL_STOP and price_open < lower_limit:
-                    remove_order(o)
-            except Exception as e:
-                traceback.print_exc()
+        # only the tails beyond the limits are far: locate them by bisection
+        buys, buy_prices, sells, sell_prices = _sorted_stops(symbol)
+        far = buys[bisect_right(buy_prices, upper_limit):] + sells[:bisect_left(sell_prices, lower_limit)]
+        if far:
+            remove_orders(far)
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"cancel_far_orders({symbol})", e)
 
 
-def cancel_far_orders_preserve(symbol, current_price, brick_size, max_up, max_down, preserve_prices=None):
+def cancel_far_orders_preserve(symbol, current_price, brick_size, max_up, max_down, preserve_prices=None, pending=None):
     try:
-        preserve_prices = preserve_prices or set()
         upper_limit = current_price + brick_size * (max_up * 3)
         lower_limit = current_price - brick_size * (max_down * 3)
-        for o in fetch_pending_orders(symbol):
-            try:
-                price_open = getattr(o, "price_open", None)
-                if price_open is None:
-                    continue
-                rprice = round_price(symbol, price_open)
-                if rprice in preserve_prices:
-                    continue
-                if int(o.type) == mt5.ORDER_TYPE_BUY_STOP and price_open > upper_limit:
-                    remove_order(o)
-                elif int(o.type) == mt5.ORDER_TYPE_SELL_STOP and price_open < lower_limit:
-                    remove_order(o)
-            except Exception as e:
-                traceback.print_exc()
+        # compare prices as integer tick counts: exact and cheaper to hash than rounded floats
+        scale = 10 ** symbol_precision(symbol)
+        preserve_ticks = {int(round(p * scale)) for p in preserve_prices or ()}
+        buy_stop, sell_stop = mt5.ORDER_TYPE_BUY_STOP, mt5.ORDER_TYPE_SELL_STOP
+        if pending is None:
+            pending = fetch_pending_orders_cached(symbol)
+        # range test first (two float compares); only far orders pay for the preserve lookup
+        far = [
+            o for o, (otype, price_open) in zip(pending, map(_type_price, pending))
+            if ((otype == buy_stop and price_open > upper_limit)
+                or (otype == sell_stop and price_open < lower_limit))
+            and not (preserve_ticks and int(round(price_open * scale)) in preserve_ticks)
+        ]
+        if far:
+            remove_orders(far)
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"cancel_far_orders_preserve({symbol})", e)
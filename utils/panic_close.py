@@ -1,5 +1,7 @@
 import MetaTrader5 as mt5
 import traceback
+from itertools import chain
+from utils.helpers import send_order_fast, mt5_lock
 
 # ----------------- MT5 Initialization -----------------
 def initialize_mt5(account, password, server):
@@ -13,20 +15,24 @@ def initialize_mt5(account, password, server):
     return True
 
 # ----------------- Fetch Positions & Orders -----------------
-def fetch_positions():
+# account-wide; named apart from the per-symbol helpers.fetch_positions/fetch_pending_orders
+def _fetch_positions_all():
     return mt5.positions_get() or []
 
-def fetch_pending_orders():
+def _fetch_pending_orders_all():
     return mt5.orders_get() or []
 
 # ----------------- Close a Position with Filling Type Fallback -----------------
-def close_position(pos):
+def close_position(pos, tick=None):
+    """Close pos at market; pass tick to reuse one already fetched for its symbol."""
     try:
         symbol = pos.symbol
         volume = pos.volume
         pos_type = int(pos.type)
 
-        tick = mt5.symbol_info_tick(symbol)
+        if tick is None:
+            with mt5_lock:
+                tick = mt5.symbol_info_tick(symbol)
         if not tick:
             print(f"[WARN] Cannot get tick for {symbol}")
             return False
@@ -35,30 +41,24 @@ def close_position(pos):
         close_type = mt5.ORDER_TYPE_SELL if pos_type == mt5.ORDER_TYPE_BUY else mt5.ORDER_TYPE_BUY
         price = tick.bid if close_type == mt5.ORDER_TYPE_SELL else tick.ask
 
-        # List of filling types to try in order
-        filling_types = [mt5.ORDER_FILLING_FOK, mt5.ORDER_FILLING_IOC, mt5.ORDER_FILLING_RETURN]
-
-        for filling_type in filling_types:
-            req = {
-                "action": mt5.TRADE_ACTION_DEAL,
-                "symbol": symbol,
-                "volume": volume,
-                "type": close_type,
-                "position": pos.ticket,
-                "price": price,
-                "deviation": 10,
-                "comment": "Panic close",
-                "type_filling": filling_type,
-            }
+        req = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": volume,
+            "type": close_type,
+            "position": pos.ticket,
+            "price": price,
+            "deviation": 10,
+            "comment": "Panic close",
+        }
 
-            res = mt5.order_send(req)
-            if res and getattr(res, "retcode", None) == mt5.TRADE_RETCODE_DONE:
-                print(f"[INFO] Closed position {pos.ticket} ({symbol}) @ {price} with filling {filling_type}")
-                return True
-            else:
-                print(f"[WARN] Filling type {filling_type} failed for position {pos.ticket}: {res}")
+        # filling-mode fallback (and per-symbol cache) lives in send_order_fast
+        res = send_order_fast(req)
+        if res is not None and res.retcode == mt5.TRADE_RETCODE_DONE:
+            print(f"[INFO] Closed position {pos.ticket} ({symbol}) @ {price}")
+            return True
 
-        print(f"[ERROR] All filling types failed for position {pos.ticket} ({symbol})")
+        print(f"[ERROR] All filling types failed for position {pos.ticket} ({symbol}): {res}")
         return False
 
     except Exception as e:
@@ -75,7 +75,8 @@ def cancel_order(order):
             "symbol": order.symbol,
             "comment": "Panic cancel",
         }
-        res = mt5.order_send(req)
+        with mt5_lock:
+            res = mt5.order_send(req)
         if res and getattr(res, "retcode", None) == mt5.TRADE_RETCODE_DONE:
             print(f"[INFO] Cancelled pending order {order.ticket} ({order.symbol}) @ {order.price_open}")
             return True
@@ -89,15 +90,22 @@ def cancel_order(order):
 
 # ----------------- Panic Close All -----------------
 def panic_close_all():
-    positions = fetch_positions()
-    pending_orders = fetch_pending_orders()
+    with mt5_lock:
+        positions = _fetch_positions_all()
+        pending_orders = _fetch_pending_orders_all()
     print(f"[INFO] Found {len(positions)} positions and {len(pending_orders)} pending orders.")
 
-    for pos in positions:
-        close_position(pos)
+    # one tick per symbol instead of one per position
+    with mt5_lock:
+        ticks = {sym: mt5.symbol_info_tick(sym) for sym in {p.symbol for p in positions}}
+
+    # send everything back-to-back; other threads' MT5 calls wait until the panic is done
+    with mt5_lock:
+        for pos in positions:
+            close_position(pos, ticks.get(pos.symbol))
 
-    for order in pending_orders:
-        cancel_order(order)
+        for order in pending_orders:
+            cancel_order(order)
 
 # ----------------- Main -----------------
 if __name__ == "__main__":
@@ -107,7 +115,8 @@ if __name__ == "__main__":
 
     if initialize_mt5(ACCOUNT, PASSWORD, SERVER):
         # Ensure all symbols are selected in Market Watch
-        symbols = set([p.symbol for p in fetch_positions()] + [o.symbol for o in fetch_pending_orders()])
-        for sym in symbols:
-            mt5.symbol_select(sym, True)
+        symbols = {x.symbol for x in chain(_fetch_positions_all(), _fetch_pending_orders_all())}
+        with mt5_lock:
+            for sym in symbols:
+                mt5.symbol_select(sym, True)
         panic_close_all()
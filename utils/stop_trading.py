@@ -6,36 +6,42 @@ Standalone module to stop the GridSystem trading bot safely and immediately.
 import threading
 import traceback
 
-# Attempt to import the trading_active flag from your main_routes
-try:
-    from routes.main_routes import trading_active
-except ImportError:
-    # Placeholder if running standalone or import fails
-    trading_active = False
+# Run flag for the grid bot: set while it should trade, cleared to stop it.
+# routes.main_routes starts/stops the bot through this same Event, and the
+# bot polls it via trading_active_flag(); is_set()/clear() need no extra lock.
+trading_active = threading.Event()
+# Mirror of the flag for sleepers: set while stopped, so loops can
+# stop_event.wait(delay) and wake the moment a stop is requested.
+trading_stopped = threading.Event()
+trading_stopped.set()
 
-# Lock to prevent race conditions
-_trading_lock = threading.Lock()
+def set_trading_active(active):
+    """Flip the run flag and its stop event together."""
+    if active:
+        trading_stopped.clear()
+        trading_active.set()
+    else:
+        # clear the flag first so woken sleepers already see it down
+        trading_active.clear()
+        trading_stopped.set()
 
 def stop_trading_bot():
     """
-    Safely stop the trading bot by setting the active flag to False.
+    Safely stop the trading bot by clearing the active flag.
     Returns a tuple: (status_message, status_type)
     """
-    global trading_active
-
-    with _trading_lock:
-        try:
-            if not trading_active:
-                return "Trading is not active!", "info"
+    try:
+        if not trading_active.is_set():
+            return "Trading is not active!", "info"
 
-            trading_active = False
-            print("[INFO] Trading stop requested successfully!")
-            return "Trading stop requested successfully!", "success"
+        set_trading_active(False)
+        print("[INFO] Trading stop requested successfully!")
+        return "Trading stop requested successfully!", "success"
 
-        except Exception as e:
-            print("[ERROR] Failed to stop trading bot:", e)
-            traceback.print_exc()
-            return f"Failed to stop trading bot: {e}", "error"
+    except Exception as e:
+        print("[ERROR] Failed to stop trading bot:", e)
+        traceback.print_exc()
+        return f"Failed to stop trading bot: {e}", "error"
 
 def stop_trading_and_mt5():
     """
@@ -1,17 +1,29 @@
 # trailing_single_fn.py
 import MetaTrader5 as mt5
 import time
-import json
 import os
+import threading
+from contextlib import nullcontext
 from typing import Dict, Optional, Callable
+from utils.fastjson import load_file
+from utils.helpers import fetch_positions_cached, bump_orders_version, log_batch_results
 
 CONFIG_DEFAULT_PATH = "config.json"
+CONFIG_RELOAD_DEBOUNCE = 0.3  # seconds; coalesces an editor's save burst into one reload
+
+_AUTH_KEYS = frozenset(("account", "password", "server"))
+
+# MT5 constants resolved once instead of per position
+_BUY = getattr(mt5, "ORDER_TYPE_BUY", 0)
+_SELL = getattr(mt5, "ORDER_TYPE_SELL", 1)
+_SLTP = getattr(mt5, "TRADE_ACTION_SLTP", None)
 
 def start_trailing_loop(
     config_path: str = CONFIG_DEFAULT_PATH,
     trading_active_flag: Callable[[], bool] = lambda: True,
     mt5_lock = None,
-    loop_delay_override: Optional[float] = None
+    loop_delay_override: Optional[float] = None,
+    stop_event: Optional[threading.Event] = None
 ) -> None:
     """
     Start a blocking trailing-stop loop. This function does NOT initialize or shutdown MT5.
@@ -22,14 +34,17 @@ def start_trailing_loop(
         trading_active_flag: callable returning True while loop should run
         mt5_lock: optional threading.Lock/RLock to serialize MT5 calls with other threads
         loop_delay_override: if provided, overrides config's loop_delay
+        stop_event: optional Event set on shutdown; lets the loop sleep without polling
     """
 
     def load_config_file(path: str) -> Dict:
-        with open(path, "r") as f:
-            cfg = json.load(f)
-        if "account" not in cfg or "password" not in cfg or "server" not in cfg:
-            raise ValueError("config.json missing required keys (account,password,server).")
-        if "symbols" not in cfg or not isinstance(cfg["symbols"], dict):
+        cfg = load_file(path)  # orjson when available
+        if not isinstance(cfg, dict):
+            raise ValueError("config.json must contain a JSON object.")
+        missing = _AUTH_KEYS.difference(cfg)
+        if missing:
+            raise ValueError(f"config.json missing required keys: {', '.join(sorted(missing))}.")
+        if not isinstance(cfg.get("symbols"), dict):
             raise ValueError("config.json must contain a 'symbols' dict.")
         return cfg
 
@@ -40,6 +55,8 @@ def start_trailing_loop(
         raise SystemExit(f"Failed to load config: {e}")
 
     _AUTH = (CONFIG.get("account"), CONFIG.get("password"), CONFIG.get("server"))
+    _config_version = 0  # bumped on every successful reload
+    _config_missing = False  # report a missing file once, not on every poll
     try:
         _last_mtime: Optional[float] = os.path.getmtime(config_path)
     except Exception:
@@ -54,12 +71,15 @@ def start_trailing_loop(
             return price
 
     def try_reload_config() -> bool:
-        nonlocal CONFIG, _last_mtime, _AUTH
+        nonlocal CONFIG, _last_mtime, _AUTH, _config_version, _config_missing
         try:
             mtime = os.path.getmtime(config_path)
         except FileNotFoundError:
-            print("Config file missing.")
+            if not _config_missing:
+                print("Config file missing.")
+                _config_missing = True
             return False
+        _config_missing = False
 
         if _last_mtime is None or mtime > _last_mtime:
             try:
@@ -78,88 +98,149 @@ def start_trailing_loop(
                 new_cfg["server"] = CONFIG["server"]
 
             CONFIG = new_cfg
+            _config_version += 1
             _last_mtime = mtime
             print("Config reloaded from file.")
             return True
 
         return False
 
-    def update_trailing_stop(symbol: str, trailing_pips: float) -> None:
+    # ----------------- Config Watcher -----------------
+    _reload_lock = threading.RLock()
+    _reload_timer: Optional[threading.Timer] = None
+
+    def reload_now() -> None:
+        with _reload_lock:
+            try:
+                try_reload_config()
+            except Exception as e:
+                print(f"[ERROR] Trailing config reload: {e}")
+
+    def schedule_reload() -> None:
+        """Restart the debounce timer; the reload runs once events go quiet."""
+        nonlocal _reload_timer
+        with _reload_lock:
+            if _reload_timer is not None:
+                _reload_timer.cancel()
+            _reload_timer = threading.Timer(CONFIG_RELOAD_DEBOUNCE, reload_now)
+            _reload_timer.daemon = True
+            _reload_timer.start()
+
+    def start_config_observer():
+        """Reload CONFIG on file events; returns None (poll per loop) if watchdog is missing."""
+        try:
+            from watchdog.observers import Observer
+            from watchdog.events import FileSystemEventHandler
+        except ImportError:
+            print("[DEBUG] watchdog not installed, trailing loop polls config mtime")
+            return None
+
+        watched = os.path.abspath(config_path)
+
+        class TrailingConfigHandler(FileSystemEventHandler):
+            def on_modified(self, event):
+                if not event.is_directory and os.path.abspath(event.src_path) == watched:
+                    schedule_reload()
+
+            def on_moved(self, event):
+                # config_cache saves via a temp file os.replace()d over config.json
+                if not event.is_directory and os.path.abspath(event.dest_path) == watched:
+                    schedule_reload()
+
+            on_created = on_modified
+
+        observer = Observer()
+        observer.daemon = True
+        observer.schedule(TrailingConfigHandler(), os.path.dirname(watched), recursive=False)
+        observer.start()
+        return observer
+
+    # mt5_lock is held only around MT5 calls; the SL arithmetic runs unlocked
+    _mt5_guard = mt5_lock if mt5_lock is not None else nullcontext()
+
+    def update_trailing_stop(symbol: str, trailing_pips: float, brick: float) -> None:
         """
         Update trailing stop for all open positions of a symbol.
-        Assumes active MT5 connection exists. Call under mt5_lock if provided.
+        Assumes active MT5 connection exists; takes mt5_lock (if provided) around MT5 calls.
         """
-        try:
-            positions = mt5.positions_get(symbol=symbol)
-        except Exception:
-            positions = None
+        with _mt5_guard:
+            # shared with the grid loop, which reads the same positions each tick
+            positions = fetch_positions_cached(symbol)
+            # one tick per symbol; it doesn't move while we walk the positions
+            tick = mt5.symbol_info_tick(symbol) if positions else None
 
-        if not positions:
+        if not positions or tick is None:
             return
 
-        brick = CONFIG["symbols"].get(symbol, {}).get("brick_size", 1.0)
-
+        # compute every SL change first, then send them back-to-back
+        updates = []
+        bid, ask = tick.bid, tick.ask
         for pos in positions:
-            tick = mt5.symbol_info_tick(symbol)
-            if tick is None:
-                continue
-
-            # pick current price based on position type
-            pos_type = getattr(pos, "type", None)
-            current_price: float = tick.bid if pos_type == getattr(mt5, "ORDER_TYPE_BUY", 0) else tick.ask
+            # MT5 position tuples always carry type/sl/tp/ticket
+            pos_type, sl = pos.type, pos.sl
             new_sl: Optional[float] = None
 
-            if pos_type == getattr(mt5, "ORDER_TYPE_BUY", 0):
-                if getattr(pos, "sl", 0) == 0 or (current_price - getattr(pos, "sl", 0)) > trailing_pips:
-                    candidate = current_price - trailing_pips
-                    new_sl = round_price(candidate, brick)
+            if pos_type == _BUY:
+                if sl == 0 or (bid - sl) > trailing_pips:
+                    new_sl = round_price(bid - trailing_pips, brick)
 
-            elif pos_type == getattr(mt5, "ORDER_TYPE_SELL", 1):
-                if getattr(pos, "sl", 0) == 0 or (getattr(pos, "sl", 0) - current_price) > trailing_pips:
-                    candidate = current_price + trailing_pips
-                    new_sl = round_price(candidate, brick)
+            elif pos_type == _SELL:
+                if sl == 0 or (sl - ask) > trailing_pips:
+                    new_sl = round_price(ask + trailing_pips, brick)
 
-            if new_sl is not None and new_sl != getattr(pos, "sl", None):
-                request = {
-                    "action": getattr(mt5, "TRADE_ACTION_SLTP", None),
-                    "position": getattr(pos, "ticket", None),
+            if new_sl is not None and new_sl != sl:
+                ticket = pos.ticket
+                updates.append((ticket, new_sl, {
+                    "action": _SLTP,
+                    "position": ticket,
                     "sl": new_sl,
-                    "tp": getattr(pos, "tp", None)
-                }
+                    "tp": pos.tp
+                }))
+
+        if not updates:
+            return
+
+        results = []
+        with _mt5_guard:
+            for ticket, new_sl, request in updates:
                 try:
-                    result = mt5.order_send(request)
+                    results.append(mt5.order_send(request))
                 except Exception as e:
-                    print(f"[{symbol}] Error sending SL update for ticket {getattr(pos,'ticket',None)}: {e}")
-                    continue
+                    results.append(e)
 
-                if getattr(result, "retcode", None) != getattr(mt5, "TRADE_RETCODE_DONE", None):
-                    print(f"[{symbol}] Failed to update SL for ticket {getattr(pos,'ticket',None)}: {getattr(result, 'retcode', result)}")
-                else:
-                    print(f"[{symbol}] Trailing SL updated for ticket {getattr(pos,'ticket',None)} to {new_sl}")
+        # one summary line per symbol pass; only exceptions get a line of their own
+        for i, ((ticket, _, _), result) in enumerate(zip(updates, results)):
+            if isinstance(result, Exception):
+                print(f"[{symbol}] Error sending SL update for ticket {ticket}: {result}")
+                results[i] = None
+        ok, _ = log_batch_results("Trailing SL", symbol, [t for t, _, _ in updates], results)
+        if ok:
+            bump_orders_version()  # cached positions now carry an old SL
 
     # main loop
     print("[INFO] Trailing loop started (no MT5 init/shutdown here).")
+    observer = start_config_observer()
+    # (symbol, trailing_pips, brick_size) for active trailing symbols, rebuilt only after a reload
+    active_cache = ()
+    active_cache_version = -1
     try:
         while trading_active_flag():
-            # try reload config if changed
-            try:
-                try_reload_config()
-            except Exception:
-                pass
+            # without watchdog, fall back to an mtime check per pass
+            if observer is None:
+                reload_now()
 
-            active_symbols = [s for s, c in CONFIG["symbols"].items() if c.get("active", False)]
-            for symbol in active_symbols:
+            if active_cache_version != _config_version:
+                active_cache_version = _config_version
+                active_cache = tuple(
+                    (s, c["trailing_stop_pips"], c.get("brick_size", 1.0))
+                    for s, c in CONFIG["symbols"].items()
+                    if c.get("active", False) and c.get("trailing_stop_pips")
+                )
+            for symbol, trailing_pips, brick in active_cache:
                 if not trading_active_flag():
                     break
-                trailing_pips = CONFIG["symbols"].get(symbol, {}).get("trailing_stop_pips", 0.0)
-                if not trailing_pips:
-                    continue
                 try:
-                    if mt5_lock is not None:
-                        with mt5_lock:
-                            update_trailing_stop(symbol, trailing_pips)
-                    else:
-                        update_trailing_stop(symbol, trailing_pips)
+                    update_trailing_stop(symbol, trailing_pips, brick)
                 except KeyboardInterrupt:
                     raise
                 except Exception as e:
@@ -167,6 +248,10 @@ def start_trailing_loop(
 
             # sleep but remain responsive to trading_active_flag
             delay = loop_delay_override if loop_delay_override is not None else CONFIG.get("loop_delay", 1)
+            if stop_event is not None:
+                if stop_event.wait(delay):
+                    break
+                continue
             slept = 0.0
             step = 0.2
             while trading_active_flag() and slept < delay:
@@ -178,4 +263,10 @@ def start_trailing_loop(
     except Exception as e:
         print(f"[ERROR] Trailing loop exception: {e}")
     finally:
+        if observer is not None:
+            observer.stop()
+            observer.join(timeout=2)
+        with _reload_lock:
+            if _reload_timer is not None:
+                _reload_timer.cancel()
         print("[INFO] Trailing loop exiting.")
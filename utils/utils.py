@@ -1,19 +1,19 @@
 # utils.py — Symmetrical Rolling/Expanding Grid Bot (multi-symbol, thread-safe, robust ticks)
 import MetaTrader5 as mt5
 import time
-import traceback
 import math
-from collections import defaultdict
-import datetime
-from threading import Thread, RLock
+import random
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from operator import neg
+from dataclasses import dataclass, field
+from typing import Optional
+from threading import Thread, Lock
 from .trailingStopLoss import start_trailing_loop
 from threading import Thread
 from utils.closeFarOrders import remove_extra_pending_orders, run_auto_cleaner
 
-# ----------------- Config / Limits -----------------
-MAX_ORDERS_PER_SYMBOL = 60  # total pending orders per symbol
-DEFAULT_MAGIC = 123456
-
 # ----------------- External imports -----------------
 from utils.order_manager import (
     place_order, remove_order, order_exists, can_place_order,
@@ -21,17 +21,78 @@ from utils.order_manager import (
 )
 from utils.helpers import (
     round_price, get_tick, fetch_pending_orders, fetch_positions,
-    highest_buy_position, lowest_sell_position
+    highest_buy_position, lowest_sell_position, mt5_lock, symbol_spec, symbol_stops_level,
+    fetch_pending_orders_cached, fetch_positions_cached, print_exc_limited, seed_symbol_spec
 )
+from utils.mt5_session import mark_mt5_ready
+
+GRID_GATE_MAX_SKIP = 5  # seconds; force a full pass at least this often
+IDLE_BACKOFF_MAX_SHIFT = 3  # idle ticks stretch loop_delay up to 2**3 = 8x
+
+# MT5 constants resolved once at import instead of per order/position
+_BUY_STOP = getattr(mt5, "ORDER_TYPE_BUY_STOP", 2)
+_SELL_STOP = getattr(mt5, "ORDER_TYPE_SELL_STOP", 3)
+_BUY_TYPES = (getattr(mt5, "ORDER_TYPE_BUY", 0), getattr(mt5, "POSITION_TYPE_BUY", 0))
+_SELL_TYPES = (getattr(mt5, "ORDER_TYPE_SELL", 1), getattr(mt5, "POSITION_TYPE_SELL", 1))
+
+# ----------------- Per-symbol State -----------------
+_UNCHECKED = object()  # SymbolState.brick_raw before the first validation
+
+@dataclass(slots=True)
+class SymbolState:
+    """Everything run_symbol_loop() carries between ticks for one symbol."""
+    last_price: Optional[float] = None  # price of the last full pass, for grid_tolerance
+    seen_tickets: set = field(default_factory=set)
+    initial_anchors: set = field(default_factory=set)
+    # (aligned base, positions_total, orders_total, checked_at) of the last full pass;
+    # while none of the first three change there is nothing new for the grid to do
+    grid_state: Optional[tuple] = None
+    idle_cycles: int = 0  # consecutive ticks skipped without a full pass
+    last_tick_msc: Optional[int] = None  # time_msc of the last quote we acted on
+    # sym_cfg["brick_size"] as last validated, and its float form (None if invalid);
+    # revalidated only when the config value changes
+    brick_raw: object = _UNCHECKED
+    brick_size: Optional[float] = None
+
+# ----------------- Helper caches / utilities -----------------
+# symbol -> set of aligned pending prices; a plain dict so reads never create entries
+_pending_cache = {}
+_EMPTY_FROZENSET = frozenset()
 
-# ----------------- Thread-safety primitives -----------------
-mt5_lock = RLock()
+def _pending_set(symbol):
+    """The symbol's pending price set for writing, created on first use."""
+    return _pending_cache.setdefault(symbol, set())
 
-# per-symbol last_price mapping used for grid_tolerance checks
-last_price = {}
+# closed_levels is an OrderedDict price -> close time (time.monotonic(), so a
+# wall-clock jump can't unblock or pin levels) kept in time order, so expiry
+# only looks at the oldest entries; shared by all symbol threads
+_closed_levels_lock = Lock()
+CLOSED_LEVELS_MAX = 10_000  # hard cap, whatever closed_level_block_seconds is set to
 
-# ----------------- Helper caches / utilities -----------------
-_pending_cache = defaultdict(set)
+def mark_level_closed(closed_levels, price):
+    """Record price as closed now, moving it to the young end of closed_levels.
+
+    Past CLOSED_LEVELS_MAX entries the oldest are dropped early, so memory
+    stays bounded even if block seconds are raised at runtime.
+    """
+    with _closed_levels_lock:
+        closed_levels.pop(price, None)
+        closed_levels[price] = time.monotonic()
+        while len(closed_levels) > CLOSED_LEVELS_MAX:
+            closed_levels.popitem(last=False)
+
+def expire_closed_levels(closed_levels, block_seconds):
+    """Drop levels closed more than block_seconds ago (oldest first, stop at the first live one)."""
+    if not closed_levels:
+        # the usual case; every symbol thread calls this each tick, so don't contend for the lock
+        return
+    cutoff = time.monotonic() - block_seconds
+    with _closed_levels_lock:
+        while closed_levels:
+            price, closed_at = next(iter(closed_levels.items()))
+            if closed_at >= cutoff:
+                break
+            closed_levels.popitem(last=False)
 
 # ----------------- Utility: ensure symbol available -----------------
 def ensure_symbol_available(symbol, tries=4, delay=0.25):
@@ -55,6 +116,8 @@ def ensure_symbol_available(symbol, tries=4, delay=0.25):
                 tick = None
 
             if info is not None and tick is not None and getattr(tick, 'ask', None) is not None:
+                # digits/point/stops_level come for free here: no symbol_info() on the first tick
+                seed_symbol_spec(symbol, info)
                 return True
             time.sleep(delay)
     except Exception:
@@ -96,38 +159,96 @@ def fetch_tick_safe(symbol):
 
 # ----------------- Price Alignment -----------------
 def align_price_to_grid_symbol(symbol, price, brick_size, mode="nearest"):
-    if brick_size is None or brick_size <= 0:
-        try:
-            return round(float(price), 8)
-        except Exception:
-            return price
+    """Snap price to a brick_size multiple (symbol is accepted for call-site symmetry only)."""
+    try:
+        return _align_price(price, brick_size, mode)
+    except TypeError:
+        # unhashable argument: compute without the cache
+        return _align_price.__wrapped__(price, brick_size, mode)
+
+def _align_nearest(price, brick_size):
+    """Nearest-mode _align_price() for a brick_size known to be positive.
+
+    The per-tick paths (pending/position price sets, candidate checks) only
+    ever align to the nearest brick of a brick_size run_symbol_loop() has
+    already checked, so they skip the mode dispatch, the try/except and the
+    cache lookup. Same arithmetic as _align_price(), so results compare equal.
+    """
+    return round(round(price / brick_size) * brick_size, 8)
+
+def _align_down(price, brick_size):
+    # the epsilon keeps a price already on a level from dropping a brick to float error
+    return round(math.floor(price / brick_size + 1e-12) * brick_size, 8)
+
+def _align_up(price, brick_size):
+    return round(math.ceil(price / brick_size - 1e-12) * brick_size, 8)
+
+# grid_rounding -> aligner; unknown modes align to the nearest brick
+_ALIGNERS = {"nearest": _align_nearest, "down": _align_down, "up": _align_up}
+
+def aligner_for(mode):
+    """The _align_* function for a grid_rounding mode, picked once instead of per call."""
+    return _ALIGNERS.get(mode, _align_nearest)
+
+# a pure function of its arguments, and broker prices sit on a tick lattice,
+# so the same (price, brick, mode) triples come back tick after tick
+@lru_cache(maxsize=16384)
+def _align_price(price, brick_size, mode):
     try:
-        ratio = float(price) / float(brick_size)
+        price = float(price)
+        if brick_size is None or brick_size <= 0:
+            return round(price, 8)
+        return aligner_for(mode)(price, float(brick_size))
     except Exception:
-        try:
-            return round(float(price), 8)
-        except Exception:
-            return price
-
-    if mode == "nearest":
-        n = int(round(ratio))
-    elif mode == "down":
-        n = math.floor(ratio + 1e-12)
-    elif mode == "up":
-        n = math.ceil(ratio - 1e-12)
-    else:
-        n = int(round(ratio))
+        return price
 
-    aligned = round(n * float(brick_size), 8)
-    return aligned
+def grid_levels(base_price, brick_size, count, direction):
+    """All `count` grid levels above (direction=1) or below (direction=-1) base_price.
+
+    Batched form of align_price_to_grid_symbol: the base is aligned once and
+    each level is an integer number of bricks from it. Price hovers around a
+    few bases tick after tick, so the level tuples are memoized per base.
+    """
+    if brick_size is None or brick_size <= 0 or count <= 0:
+        return ()
+    brick = float(brick_size)
+    return _grid_levels(int(round(float(base_price) / brick)), brick, int(count), direction)
+
+@lru_cache(maxsize=512)
+def _grid_levels(n0, brick, count, direction):
+    return tuple(round((n0 + direction * i) * brick, 8) for i in range(1, count + 1))
+
+def new_grid_levels(base_price, brick_size, count, direction, existing=(), closed=None, beyond=None):
+    """grid_levels() minus levels in existing or closed.
+
+    With beyond set, also keeps only levels strictly past it in the grid's
+    direction (above for direction=1, below for -1). Levels run outward from
+    the base, so that cut is one bisect instead of a compare per level; the
+    set checks then run over the survivors only.
+    """
+    levels = grid_levels(base_price, brick_size, count, direction)
+    if beyond is not None:
+        levels = levels_beyond(levels, beyond, direction)
+    if not closed:
+        # the usual case: nothing recently closed, one membership test per level
+        return [p for p in levels if p not in existing]
+    return [p for p in levels if p not in existing and p not in closed]
+
+def levels_beyond(levels, beyond, direction):
+    """The tail of levels (ordered outward from the base) strictly past beyond."""
+    if direction > 0:
+        return levels[bisect_right(levels, beyond):]
+    return levels[bisect_right(levels, -beyond, key=neg):]
 
 # ----------------- MT5 Initialization -----------------
 def initialize_mt5(account, password, server):
     try:
-        if not mt5.initialize():
-            return False
-        if not mt5.login(account, password=password, server=server):
-            return False
+        with mt5_lock:
+            if not mt5.initialize():
+                return False
+            if not mt5.login(account, password=password, server=server):
+                return False
+        mark_mt5_ready()
         return True
     except Exception as e:
         return False
@@ -142,48 +263,102 @@ t.start()
 t2 = Thread(target=run_auto_cleaner, kwargs={"interval": 1}, daemon=True)
 t2.start()
 # ----------------- Helper caches / utilities -----------------
-def sync_pending_cache(symbol, brick_size):
-    """Populate _pending_cache[symbol] with aligned pending prices from broker."""
+# symbol -> (brick_size, {ticket: (price_open, aligned)}) from the previous pending_price_sets() pass
+_pending_aligned = {}
+
+def pending_price_sets(symbol, pending, brick_size):
+    """One pass over pending orders -> (all, buy_stop, sell_stop) sets of aligned prices.
+
+    A grid's orders mostly survive from one pass to the next, so aligned
+    prices are remembered per ticket and only new or moved orders are aligned.
+    """
+    memo = _pending_aligned.get(symbol)
+    known = memo[1] if memo is not None and memo[0] == brick_size else {}
+    seen = {}
+    prices, buys, sells = set(), set(), set()
+    for o in pending:
+        po = getattr(o, "price_open", None)
+        if po is None:
+            continue
+        ticket = o.ticket
+        hit = known.get(ticket)
+        if hit is not None and hit[0] == po:
+            aligned = hit[1]
+        else:
+            aligned = _align_nearest(po, brick_size)
+        seen[ticket] = (po, aligned)
+        prices.add(aligned)
+        otype = o.type
+        if otype == _BUY_STOP:
+            buys.add(aligned)
+        elif otype == _SELL_STOP:
+            sells.add(aligned)
+    # keep only live tickets, so filled/cancelled orders don't accumulate
+    _pending_aligned[symbol] = (brick_size, seen)
+    return prices, buys, sells
+
+def sync_pending_cache(symbol, brick_size, pending=None):
+    """Populate _pending_cache[symbol] from broker; returns (buy_stop, sell_stop) price sets.
+
+    Pass pending to reuse an orders list the caller already fetched this tick.
+    """
     try:
-        with mt5_lock:
-            pending = fetch_pending_orders(symbol) or []
-        prices = set()
-        for o in pending:
-            po = getattr(o, "price_open", None)
-            if po is None:
-                continue
-            prices.add(align_price_to_grid_symbol(symbol, po, brick_size))
+        if pending is None:
+            with mt5_lock:
+                pending = fetch_pending_orders(symbol) or []
+        prices, buys, sells = pending_price_sets(symbol, pending, brick_size)
         _pending_cache[symbol] = prices
-        return prices
+        return buys, sells
     except Exception:
-        return _pending_cache.get(symbol, set())
+        cached = _pending_cache.get(symbol, _EMPTY_FROZENSET)
+        return set(cached), set(cached)
 
-def get_open_positions_prices(symbol, brick_size):
-    try:
-        with mt5_lock:
-            positions = fetch_positions(symbol) or []
-        return {align_price_to_grid_symbol(symbol, getattr(p, "price_open", getattr(p, "price", 0)), brick_size) for p in positions}
-    except Exception:
-        return set()
+# symbol -> (positions, brick_size, (all, buys, sells)) for the last positions seen
+_position_levels_cache = {}
+
+def position_levels(symbol, positions, brick_size):
+    """(all, buys, sells) aligned open-position prices: a set and two sorted lists.
 
-def get_open_positions_info(symbol, brick_size):
-    """Return list of dicts: [{'ticket':..., 'type':0/1, 'raw_price':..., 'aligned':...}, ...]"""
-    out = []
+    fetch_positions_cached() hands every caller in a tick the same tuple, so
+    the grid, the placement context and the mirror pass share one alignment
+    pass per fetch instead of each walking the positions again.
+    """
+    entry = _position_levels_cache.get(symbol)
+    if entry is not None and entry[0] is positions and entry[1] == brick_size:
+        return entry[2]
+    prices, buys, sells = set(), [], []
+    for p in positions:
+        aligned = _align_nearest(p.price_open, brick_size)
+        prices.add(aligned)
+        if p.type in _BUY_TYPES:
+            buys.append(aligned)
+        elif p.type in _SELL_TYPES:
+            sells.append(aligned)
+    buys.sort()
+    sells.sort()
+    levels = (prices, buys, sells)
+    _position_levels_cache[symbol] = (positions, brick_size, levels)
+    return levels
+
+# symbol -> (pending, brick_size, frozenset) for the last pending orders seen
+_pending_levels_cache = {}
+
+def pending_levels(symbol, pending, brick_size):
+    """Aligned prices of pending as a frozenset, memoized per fetched orders tuple like position_levels()."""
+    entry = _pending_levels_cache.get(symbol)
+    if entry is not None and entry[0] is pending and entry[1] == brick_size:
+        return entry[2]
+    levels = frozenset(pending_price_sets(symbol, pending, brick_size)[0])
+    _pending_levels_cache[symbol] = (pending, brick_size, levels)
+    return levels
+
+def get_open_positions_prices(symbol, brick_size, positions=None):
     try:
-        with mt5_lock:
-            positions = fetch_positions(symbol) or []
-        for p in positions:
-            try:
-                ticket = getattr(p, "ticket", None) or f"{getattr(p,'price_open',0)}_{getattr(p,'volume',0)}"
-                typ = int(getattr(p, "type", -1))  # 0=BUY,1=SELL typically
-                raw = getattr(p, "price_open", getattr(p, "price", None))
-                aligned = align_price_to_grid_symbol(symbol, raw, brick_size)
-                out.append({"ticket": ticket, "type": typ, "raw": raw, "aligned": aligned})
-            except Exception:
-                continue
+        if positions is None:
+            positions = fetch_positions_cached(symbol)
+        return position_levels(symbol, positions, brick_size)[0]
     except Exception:
-        pass
-    return out
+        return set()
 
 def _place_order_and_handle_return(order_type, symbol, price_aligned, volume, sl_pips=None, tp_pips=None):
     try:
@@ -197,314 +372,304 @@ def _place_order_and_handle_return(order_type, symbol, price_aligned, volume, sl
             msg = ""
         return ok, msg
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"_place_order_and_handle_return({symbol})", e)
         return False, f"exception in place_order wrapper: {e}"
 
 # ----------------- New utility check: ensure level has no existing pending/order/position -----------------
-def level_has_existing_order_or_position(symbol, price_aligned, brick_size):
+def level_has_existing_order_or_position(symbol, price_aligned, brick_size, pending_prices=None, position_prices=None):
     """
     Returns True if there already exists a pending order (broker-side or cached) OR an open position
     at the given aligned level for this symbol.
-    This function acquires mt5_lock where needed.
+    This function acquires mt5_lock where needed. Callers that synced this tick pass the aligned
+    pending_prices and position_prices sets; the check is then two lookups and no MT5 calls.
+    Without them it reads the cached orders/positions snapshots, aligned once per fetch.
     """
     try:
+        if pending_prices is not None and position_prices is not None:
+            return price_aligned in pending_prices or price_aligned in position_prices
+
         # 1) local cache quick-check
-        if price_aligned in _pending_cache.get(symbol, set()):
+        if price_aligned in _pending_cache.get(symbol, _EMPTY_FROZENSET):
             return True
 
-        # 2) broker pending orders
-        with mt5_lock:
-            pending = fetch_pending_orders(symbol) or []
-        for o in pending:
-            po = getattr(o, "price_open", None)
-            if po is None:
-                continue
-            if align_price_to_grid_symbol(symbol, po, brick_size) == price_aligned:
-                # update cache for future
-                _pending_cache[symbol].add(price_aligned)
-                return True
+        # 2) broker pending orders and open positions, from the shared short-lived
+        # snapshots: repeated calls within a tick cost set lookups, not MT5 round trips
+        pending = fetch_pending_orders_cached(symbol)
+        positions = fetch_positions_cached(symbol)
+        if price_aligned in pending_levels(symbol, pending, brick_size):
+            # update cache for future
+            _pending_set(symbol).add(price_aligned)
+            return True
 
         # 3) open positions check
-        with mt5_lock:
-            positions = fetch_positions(symbol) or []
-        for p in positions:
-            raw = getattr(p, "price_open", getattr(p, "price", None))
-            if raw is None:
-                continue
-            if align_price_to_grid_symbol(symbol, raw, brick_size) == price_aligned:
-                return True
+        if price_aligned in position_levels(symbol, positions, brick_size)[0]:
+            return True
 
         return False
     except Exception:
         # be conservative: if we can't be sure, assume exists (to avoid duplicate)
         return True
 
+# ----------------- Per-tick symbol context -----------------
+@dataclass(slots=True)
+class SymCtx:
+    """What safe_place_order() needs about a symbol, fetched once per tick instead of per order."""
+    tick: object
+    point: float
+    min_dist: float     # broker stops level as a price distance
+    threshold: float    # how close an opposing position blocks a level
+    open_prices: set    # aligned prices of all open positions (shared; read only)
+    open_buys: list     # sorted aligned prices of open BUY positions (shared; read only)
+    open_sells: list    # sorted aligned prices of open SELL positions (shared; read only)
+
+def symbol_context(symbol, brick_size, tick=None, positions=None):
+    """Build a SymCtx, fetching the tick and positions only if the caller doesn't have them."""
+    if tick is None:
+        with mt5_lock:
+            tick = mt5.symbol_info_tick(symbol)
+    digits, point = symbol_spec(symbol)
+    if point is None:
+        point = 10**-digits if digits else 1e-5
+    # compute a conservative SMALL threshold (avoid blocking whole bricks):
+    if brick_size and brick_size > 0:
+        threshold = min(float(brick_size) / 10.0, float(point) / 10.0)
+    else:
+        threshold = float(point) / 10.0
+    if threshold <= 0:
+        threshold = float(point) or 1e-5
+    min_dist = symbol_stops_level(symbol) * (point or 1)
+    if positions is None:
+        positions = fetch_positions_cached(symbol)
+    open_prices, open_buys, open_sells = position_levels(symbol, positions, brick_size)
+    return SymCtx(tick, point, min_dist, threshold, open_prices, open_buys, open_sells)
+
+def near_open(price, open_sorted, threshold):
+    """True if a price in the sorted list open_sorted lies within threshold of price.
+
+    Only the two neighbours around price's insertion point can be the closest,
+    so this is one bisect instead of a scan over every open position.
+    """
+    i = bisect_left(open_sorted, price)
+    if i < len(open_sorted) and open_sorted[i] - price < threshold:
+        return True
+    return i > 0 and price - open_sorted[i - 1] < threshold
+
 # ----------------- safe_place_order (locks minimally) -----------------
-def safe_place_order(order_type, symbol, price, volume, brick_size, sl_pips=None, tp_pips=None, closed_levels=None):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-    prefix = f"[{timestamp}] [{symbol}]"
+def safe_place_order(order_type, symbol, price, volume, brick_size, sl_pips=None, tp_pips=None, closed_levels=None,
+                     pending_prices=None, position_prices=None, ctx=None, aligned=False):
     try:
-        # 1️⃣ Align price (pure CPU)
-        price_aligned = align_price_to_grid_symbol(symbol, price, brick_size)
+        # 1️⃣ Align price (pure CPU); grid_levels() output is already on the grid, so callers
+        # placing those pass aligned=True
+        price_aligned = price if aligned else _align_nearest(price, brick_size)
 
         # 2️⃣ Closed levels
         if closed_levels and price_aligned in closed_levels:
             return False
 
         # 3️⃣ Check if level already has existing pending or open pos
-        if level_has_existing_order_or_position(symbol, price_aligned, brick_size):
+        if level_has_existing_order_or_position(symbol, price_aligned, brick_size, pending_prices, position_prices):
             return False
 
-        # 4️⃣ Server-side pending check via order_exists as last confirmation
-        try:
-            with mt5_lock:
+        # 4️⃣ Server-side pending check via order_exists as last confirmation; callers passing
+        # this tick's pending_prices already covered it in 3️⃣, and place_order() repeats the
+        # same (type, price) snapshot lookup before sending anyway
+        if pending_prices is None:
+            try:
+                # snapshot lookup; order_manager only takes mt5_lock if it has to refetch
                 exists = order_exists(symbol, price_aligned, order_type)
-        except Exception:
-            exists = False
-        if exists:
-            _pending_cache[symbol].add(price_aligned)
-            return False
-
-        # 5️⃣ symbol info & tick (under lock)
-        with mt5_lock:
-            info = mt5.symbol_info(symbol)
-            tick = mt5.symbol_info_tick(symbol)
+            except Exception:
+                exists = False
+            if exists:
+                _pending_set(symbol).add(price_aligned)
+                return False
 
-        digits = getattr(info, "digits", 5) if info else 5
-        point = getattr(info, "point", 10**-digits if digits else 1e-5)
+        # 5️⃣ tick, specs and open positions: from the caller's per-tick context if given
+        if ctx is None:
+            ctx = symbol_context(symbol, brick_size)
+        tick, threshold = ctx.tick, ctx.threshold
 
-        # compute a conservative SMALL threshold (avoid blocking whole bricks):
-        if brick_size and brick_size > 0:
-            threshold = min(float(brick_size) / 10.0, float(point) / 10.0)
+        # 6️⃣ Open positions check (type-aware)  -> already covered by level_has_existing..., but keep extra guard
+        # Decide blocking: only block if an OPPOSING open position exists too-close to candidate:
+        # a SELL open for a BUY_STOP, a BUY open for a SELL_STOP. The side is resolved once here.
+        is_buy = order_type == _BUY_STOP
+        if is_buy:
+            opposing = ctx.open_sells
+        elif order_type == _SELL_STOP:
+            opposing = ctx.open_buys
         else:
-            threshold = float(point) / 10.0
-        if threshold <= 0:
-            threshold = float(point) or 1e-5
+            opposing = None
+        if opposing and near_open(price_aligned, opposing, threshold):
+            return False
 
-        # 6️⃣ Open positions check (type-aware)  -> already covered by level_has_existing..., but keep extra guard
-        open_info = get_open_positions_info(symbol, brick_size)
-
-        # Decide blocking: only block if an OPPOSING open position exists too-close to candidate.
-        buy_constant = getattr(mt5, "ORDER_TYPE_BUY", 0)
-        sell_constant = getattr(mt5, "ORDER_TYPE_SELL", 1)
-        buy_stop_const = getattr(mt5, "ORDER_TYPE_BUY_STOP", 2)
-        sell_stop_const = getattr(mt5, "ORDER_TYPE_SELL_STOP", 3)
-
-        for oi in open_info:
-            pos_type = int(oi.get("type", -1))
-            aligned_op = oi.get("aligned", None)
-            if aligned_op is None:
-                continue
-            # If placing BUY_STOP, block only if there's an existing SELL open near the same aligned price
-            if order_type == buy_stop_const:
-                if pos_type in (sell_constant, getattr(mt5, "POSITION_TYPE_SELL", 1)):
-                    if abs(price_aligned - aligned_op) < threshold:
-                        return False
-            # If placing SELL_STOP, block only if there's an existing BUY open near the same aligned price
-            if order_type == sell_stop_const:
-                if pos_type in (buy_constant, getattr(mt5, "POSITION_TYPE_BUY", 0)):
-                    if abs(price_aligned - aligned_op) < threshold:
-                        return False
-
-        # 7️⃣ Broker min distance
-        if info and tick:
-            stops_level = getattr(info, "trade_stops_level", 0) or 0
-            min_dist = stops_level * (point or 1)
-
-            if order_type == buy_stop_const:
-                ask_val = (tick.ask if tick and getattr(tick, 'ask', None) is not None else 0)
-                if price_aligned <= ask_val + min_dist:
+        # 7️⃣ Broker min distance: BUY_STOPs above ask + min_dist, SELL_STOPs below bid - min_dist
+        if tick and opposing is not None:  # None: not a stop order, no side to check
+            if is_buy:
+                ask_val = tick.ask if tick.ask is not None else 0
+                if price_aligned <= ask_val + ctx.min_dist:
                     return False
-            if order_type == sell_stop_const:
-                bid_val = (tick.bid if tick and getattr(tick, 'bid', None) is not None else 0)
-                if price_aligned >= bid_val - min_dist:
+            else:
+                bid_val = tick.bid if tick.bid is not None else 0
+                if price_aligned >= bid_val - ctx.min_dist:
                     return False
 
         # 8️⃣ Place order
         ok, msg = _place_order_and_handle_return(order_type, symbol, price_aligned, volume, sl_pips=sl_pips, tp_pips=tp_pips)
         if ok:
-            _pending_cache[symbol].add(price_aligned)
+            _pending_set(symbol).add(price_aligned)
             return True
         else:
             return False
 
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"safe_place_order({symbol})", e)
         return False
 
 # ----------------- update_grid (fixed logic using config levels) -----------------
 def update_grid(symbol, current_price, brick_size, lot,
                 trade_side="both", sl_pips=None, tp_pips=None, closed_levels=None,
-                initial_buy_levels=0, initial_sell_levels=0):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-    prefix = f"[{timestamp}] [{symbol}]"
+                initial_buy_levels=0, initial_sell_levels=0, pending=None, stop_sets=None, ctx=None):
     try:
         # Set number of grid levels from config
         CHECK_UP = int(initial_buy_levels) if initial_buy_levels else 0
         CHECK_DOWN = int(initial_sell_levels) if initial_sell_levels else 0
 
-        pending_prices = sync_pending_cache(symbol, brick_size) or set()
-        with mt5_lock:
-            tick = mt5.symbol_info_tick(symbol)
-            info = mt5.symbol_info(symbol)
-        stops_level = getattr(info, "trade_stops_level", 0) if info else 0
-        digits = getattr(info, "digits", 5) if info else 5
-        point = getattr(info, "point", 10**-digits if digits else 1e-5)
-        min_dist = stops_level * (point or 1)
+        if stop_sets is None:
+            buy_prices, sell_prices = sync_pending_cache(symbol, brick_size, pending)
+        else:
+            _pending_cache[symbol], buy_prices, sell_prices = stop_sets
 
-        base_nearest = align_price_to_grid_symbol(symbol, current_price, brick_size, mode="nearest")
+        base_nearest = _align_nearest(current_price, brick_size)
+        # safe_place_order() adds what it places to _pending_cache[symbol], i.e. to pending_all
+        pending_all = _pending_set(symbol)
 
-        # BUY_STOPs
+        # cheap checks first (cached levels and set lookups, no MT5 calls); buy_prices and
+        # sell_prices are subsets of pending_all, so one lookup there covers both sides
+        buy_candidates = sell_candidates = ()
         if trade_side in ("buy", "both"):
-            for i in range(1, CHECK_UP + 1):
-                candidate_raw = base_nearest + i * brick_size
-                candidate = align_price_to_grid_symbol(symbol, candidate_raw, brick_size, mode="up")
-
-                if candidate in pending_prices:
-                    continue
-                if closed_levels and candidate in closed_levels:
-                    continue
-
-                # additional robust check: existing pending or positions at same level
-                if level_has_existing_order_or_position(symbol, candidate, brick_size):
-                    continue
-
-                if tick and candidate <= tick.ask + min_dist:
-                    continue
-
-                placed = safe_place_order(getattr(mt5, "ORDER_TYPE_BUY_STOP", 2),
-                                         symbol, candidate, lot, brick_size,
-                                         sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels)
-                if placed:
-                    pending_prices.add(candidate)
-                else:
-                    pass
-
-        # SELL_STOPs
+            buy_candidates = new_grid_levels(base_nearest, brick_size, CHECK_UP, 1, pending_all, closed_levels)
         if trade_side in ("sell", "both"):
-            for i in range(1, CHECK_DOWN + 1):
-                candidate_raw = base_nearest - i * brick_size
-                candidate = align_price_to_grid_symbol(symbol, candidate_raw, brick_size, mode="down")
-
-                if candidate in pending_prices:
-                    continue
-                if closed_levels and candidate in closed_levels:
-                    continue
-
-                if level_has_existing_order_or_position(symbol, candidate, brick_size):
-                    continue
-
-                if tick and candidate >= tick.bid - min_dist:
-                    continue
-
-                placed = safe_place_order(getattr(mt5, "ORDER_TYPE_SELL_STOP", 3),
-                                         symbol, candidate, lot, brick_size,
-                                         sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels)
-                if placed:
-                    pending_prices.add(candidate)
-                else:
-                    pass
+            sell_candidates = new_grid_levels(base_nearest, brick_size, CHECK_DOWN, -1, pending_all, closed_levels)
+        if not buy_candidates and not sell_candidates:
+            # every level around the base is already pending or closed: skip the tick/positions lookups
+            return
+
+        # tick, specs and open positions once per tick (from the caller if it has them),
+        # shared by every order below
+        if ctx is None:
+            ctx = symbol_context(symbol, brick_size)
+        tick, min_dist = ctx.tick, ctx.min_dist
+        position_prices = ctx.open_prices
+
+        # BUY_STOPs past the broker's min distance above the ask, SELL_STOPs below the bid;
+        # pending and closed levels are already out, so only open positions are left to check
+        if buy_candidates and tick:
+            buy_candidates = levels_beyond(buy_candidates, tick.ask + min_dist, 1)
+        if sell_candidates and tick:
+            sell_candidates = levels_beyond(sell_candidates, tick.bid - min_dist, -1)
+        # (order_type, candidate, price set to record it in), placed in one run below
+        to_place = [(_BUY_STOP, p, buy_prices) for p in buy_candidates if p not in position_prices]
+        to_place += [(_SELL_STOP, p, sell_prices) for p in sell_candidates if p not in position_prices]
+
+        # one lock hold for the batch: no other thread's MT5 calls land between
+        # the orders, so they all go out against the same market
+        if to_place:
+            with mt5_lock:
+                for order_type, candidate, side_prices in to_place:
+                    if safe_place_order(order_type, symbol, candidate, lot, brick_size,
+                                        sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels,
+                                        pending_prices=pending_all, position_prices=position_prices, ctx=ctx,
+                                        aligned=True):
+                        side_prices.add(candidate)
 
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"update_grid({symbol})", e)
 
 # ----------------- Mirror-on-execution logic (unchanged but type-aware) -----------------
 def handle_new_positions_and_create_mirrors(symbol, brick_size, lot, seen_tickets, sym_cfg,
                                             trade_side="both", sl_pips=None, tp_pips=None,
-                                            closed_levels=None, closed_block_seconds=300):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
-    prefix = f"[{timestamp}] [{symbol}]"
+                                            closed_levels=None, closed_block_seconds=300, positions=None, pending=None,
+                                            stop_sets=None, ctx=None):
     try:
-        positions = fetch_positions(symbol) or []
+        if positions is None:
+            positions = fetch_positions(symbol) or []
         created = False
         current_tickets = set()
 
         initial_buy = sym_cfg.get("initial_levels_buy", sym_cfg.get("max_up", 0))
         initial_sell = sym_cfg.get("initial_levels_sell", sym_cfg.get("max_down", 0))
 
-        open_pos_prices = {align_price_to_grid_symbol(symbol, getattr(p, "price_open", getattr(p, "price", 0)), brick_size) for p in positions}
+        open_pos_prices = position_levels(symbol, positions, brick_size)[0]
 
-        with mt5_lock:
-            info = mt5.symbol_info(symbol)
-        digits = getattr(info, "digits", 5) if info else 5
-        point = getattr(info, "point", 10**-digits if digits else 1e-5)
-
-        # threshold small: min(brick/10, point/10) to avoid blocking neighbours due to rounding
-        if brick_size and brick_size > 0:
-            threshold = min(float(brick_size) / 10.0, float(point) / 10.0)
-        else:
-            threshold = float(point) / 10.0
-        if threshold <= 0:
-            threshold = float(point) or 1e-5
+        # (all, buy_stop, sell_stop) pending prices and the placement context unless
+        # the caller passed them; built on the first new position only
+        # (order_type, price, volume, side price set) mirrors to place, and their prices
+        to_place, queued = [], set()
 
         for p in positions:
             ticket = getattr(p, "ticket", None) or f"{getattr(p,'price_open',0)}_{getattr(p,'volume',0)}"
             current_tickets.add(ticket)
 
             if ticket not in seen_tickets:
-                typ = int(getattr(p, "type", -1))  # 0=BUY,1=SELL usually
-                price_open = align_price_to_grid_symbol(symbol, getattr(p, "price_open", getattr(p, "price", None)), brick_size)
+                if stop_sets is None:
+                    if pending is None:
+                        with mt5_lock:
+                            pending = fetch_pending_orders(symbol) or []
+                    stop_sets = pending_price_sets(symbol, pending, brick_size)
+                if ctx is None:
+                    ctx = symbol_context(symbol, brick_size, positions=positions)
+                pending_all, existing_buys, existing_sells = stop_sets
+                typ = p.type  # 0=BUY, 1=SELL
+                price_open = _align_nearest(getattr(p, "price_open", getattr(p, "price", None)), brick_size)
                 vol = getattr(p, "volume", lot)
 
                 # If this is a BUY position, create SELL_STOP mirrors below (if allowed)
-                if typ in (0, getattr(mt5, "ORDER_TYPE_BUY", 0)) and trade_side in ("sell", "both"):
-                    for i in range(1, int(initial_sell) + 1):
-                        sell_price = align_price_to_grid_symbol(symbol, price_open - brick_size * i, brick_size, mode="down")
-                        if closed_levels and sell_price in closed_levels:
-                            continue
+                if typ in _BUY_TYPES and trade_side in ("sell", "both"):
+                    for sell_price in new_grid_levels(price_open, brick_size, int(initial_sell), -1,
+                                                      existing_sells, closed_levels):
                         # Skip if any existing order/position at that level
-                        if level_has_existing_order_or_position(symbol, sell_price, brick_size):
+                        if sell_price in pending_all or sell_price in open_pos_prices:
                             continue
-                        if sell_price in _pending_cache.get(symbol, set()):
+                        if sell_price in _pending_cache.get(symbol, _EMPTY_FROZENSET) or sell_price in queued:
                             continue
-                        # server-side order_exists
-                        try:
-                            with mt5_lock:
-                                exists = order_exists(symbol, sell_price, mt5.ORDER_TYPE_SELL_STOP)
-                        except Exception:
-                            exists = False
-                        if exists:
-                            _pending_cache[symbol].add(sell_price)
-                            continue
-                        placed = safe_place_order(mt5.ORDER_TYPE_SELL_STOP, symbol, sell_price, vol, brick_size, sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels)
-                        if placed:
-                            created = True
+                        queued.add(sell_price)
+                        to_place.append((_SELL_STOP, sell_price, vol, existing_sells))
 
                 # If this is a SELL position, create BUY_STOP mirrors above (if allowed)
-                elif typ in (1, getattr(mt5, "ORDER_TYPE_SELL", 1)) and trade_side in ("buy", "both"):
-                    for i in range(1, int(initial_buy) + 1):
-                        buy_price = align_price_to_grid_symbol(symbol, price_open + brick_size * i, brick_size, mode="up")
-                        if closed_levels and buy_price in closed_levels:
-                            continue
-                        if level_has_existing_order_or_position(symbol, buy_price, brick_size):
+                elif typ in _SELL_TYPES and trade_side in ("buy", "both"):
+                    for buy_price in new_grid_levels(price_open, brick_size, int(initial_buy), 1,
+                                                     existing_buys, closed_levels):
+                        if buy_price in pending_all or buy_price in open_pos_prices:
                             continue
-                        if buy_price in _pending_cache.get(symbol, set()):
+                        if buy_price in _pending_cache.get(symbol, _EMPTY_FROZENSET) or buy_price in queued:
                             continue
-                        try:
-                            with mt5_lock:
-                                exists = order_exists(symbol, buy_price, mt5.ORDER_TYPE_BUY_STOP)
-                        except Exception:
-                            exists = False
-                        if exists:
-                            _pending_cache[symbol].add(buy_price)
-                            continue
-                        placed = safe_place_order(mt5.ORDER_TYPE_BUY_STOP, symbol, buy_price, vol, brick_size, sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels)
-                        if placed:
-                            created = True
+                        queued.add(buy_price)
+                        to_place.append((_BUY_STOP, buy_price, vol, existing_buys))
 
                 seen_tickets.add(ticket)
 
+        # every new position's mirrors, BUY and SELL stops alike, go out in one lock hold
+        if to_place:
+            pending_all = stop_sets[0]
+            with mt5_lock:
+                for order_type, price, vol, side_prices in to_place:
+                    if safe_place_order(order_type, symbol, price, vol, brick_size, sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels,
+                                        pending_prices=pending_all, position_prices=open_pos_prices, ctx=ctx,
+                                        aligned=True):
+                        pending_all.add(price)
+                        side_prices.add(price)
+                        created = True
+
         for t in list(seen_tickets):
             if t not in current_tickets:
                 try:
                     if isinstance(t, str) and "_" in t:
                         pstr = t.split("_")[0]
-                        closed_price = float(pstr)
+                        # level sets hold grid-aligned prices; a raw price_open would never match them
+                        closed_price = _align_nearest(float(pstr), brick_size)
                         if closed_levels is not None:
-                            closed_levels[closed_price] = time.time()
-                        for sym in _pending_cache:
-                            if closed_price in _pending_cache[sym]:
-                                _pending_cache[sym].discard(closed_price)
+                            mark_level_closed(closed_levels, closed_price)
+                        if symbol in _pending_cache:
+                            _pending_cache[symbol].discard(closed_price)
                 except Exception:
                     pass
                 seen_tickets.discard(t)
@@ -512,21 +677,49 @@ def handle_new_positions_and_create_mirrors(symbol, brick_size, lot, seen_ticket
         return created
 
     except Exception as e:
-        traceback.print_exc()
+        print_exc_limited(f"handle_new_positions_and_create_mirrors({symbol})", e)
         return False
 
 # ----------------- Per-symbol worker -----------------
-def run_symbol_loop(symbol, sym_cfg, config, seen_tickets, closed_levels, initial_anchors, trading_active_flag):
+def _pause(stop_event, delay):
+    """Sleep delay seconds, waking early (returns True) once stop_event is set."""
+    if stop_event is None:
+        time.sleep(delay)
+        return False
+    return stop_event.wait(delay)
+
+def _idle_delay(st, loop_delay):
+    """loop_delay doubled per idle tick (capped at 8x), with +-10% jitter so symbol threads drift apart."""
+    st.idle_cycles += 1
+    return loop_delay * (1 << min(st.idle_cycles, IDLE_BACKOFF_MAX_SHIFT)) * random.uniform(0.9, 1.1)
+
+def _check_brick(symbol, st, raw_brick):
+    """Validate a new sym_cfg["brick_size"] into st.brick_size, reporting an invalid one once.
+
+    The hot path assumes brick_size > 0 and a float, so every level computed
+    from it is a float too.
+    """
+    st.brick_raw = raw_brick
+    if isinstance(raw_brick, (int, float)) and raw_brick > 0:
+        st.brick_size = float(raw_brick)
+    else:
+        st.brick_size = None
+        print(f"[ERROR] {symbol}: invalid brick_size {raw_brick!r}, grid paused")
+
+def run_symbol_loop(symbol, sym_cfg, config, st, closed_levels, trading_active_flag, stop_event=None, phase=0.0):
     lot_size = sym_cfg["lot_size"]
     brick_size = sym_cfg["brick_size"]
     trade_side = sym_cfg.get("trade_side", "both")
     sl_pips = sym_cfg.get("stop_loss_pips")
     tp_pips = sym_cfg.get("take_profit_pips")
-    rounding_mode = sym_cfg.get("grid_rounding", "nearest")
     loop_delay = config.get("loop_delay", 1)
     max_up = sym_cfg.get("max_up", 0)
     max_down = sym_cfg.get("max_down", 0)
 
+    # start phase seconds into the loop_delay cycle, so symbol threads take turns on mt5_lock
+    if phase and _pause(stop_event, phase):
+        return
+
     # try to make symbol available early
     ok = ensure_symbol_available(symbol, tries=3, delay=0.2)
     if not ok:
@@ -535,62 +728,99 @@ def run_symbol_loop(symbol, sym_cfg, config, seen_tickets, closed_levels, initia
     while trading_active_flag():
         try:
             # cleanup closed levels
-            now = time.time()
-            block_seconds = config.get("closed_level_block_seconds", 300)
-            for price_key in list(closed_levels.keys()):
-                if now - closed_levels[price_key] > block_seconds:
-                    del closed_levels[price_key]
+            expire_closed_levels(closed_levels, config.get("closed_level_block_seconds", 300))
 
             # fetch tick robustly
             tick = fetch_tick_safe(symbol)
             if not tick or getattr(tick, 'ask', None) is None:
                 # no tick; try to ensure symbol and continue
                 ensure_symbol_available(symbol, tries=1, delay=0.1)
-                time.sleep(loop_delay)
+                _pause(stop_event, loop_delay)
                 continue
 
             price = tick.ask
 
+            # both skip gates below only apply while the last full pass is recent; one clock read serves them
+            state = st.grid_state
+            gate_open = state is not None and time.monotonic() - state[3] < GRID_GATE_MAX_SKIP
+
+            # no new quote since the last pass: nothing can have moved, skip even the totals RPCs
+            tick_msc = getattr(tick, "time_msc", None)
+            if gate_open and tick_msc is not None and tick_msc == st.last_tick_msc:
+                _pause(stop_event, _idle_delay(st, loop_delay))
+                continue
+            st.last_tick_msc = tick_msc
+
             # grid_tolerance check
-            if symbol in last_price and abs(price - last_price.get(symbol, 0)) < config.get("grid_tolerance", 0.0):
-                time.sleep(loop_delay)
+            if st.last_price is not None and abs(price - st.last_price) < config.get("grid_tolerance", 0.0):
+                _pause(stop_event, _idle_delay(st, loop_delay))
                 continue
 
             # keep local copies (do not change strategy logic)
-            brick_size = sym_cfg["brick_size"]
+            raw_brick = sym_cfg["brick_size"]
+            if raw_brick is not st.brick_raw:
+                _check_brick(symbol, st, raw_brick)
+            brick_size = st.brick_size
+            if brick_size is None:
+                # no grid without a brick (grid_levels() yields nothing); reported once in _check_brick()
+                _pause(stop_event, loop_delay)
+                continue
             max_up = sym_cfg.get("max_up", 0)
             max_down = sym_cfg.get("max_down", 0)
             lot_size = sym_cfg["lot_size"]
             trade_side = sym_cfg.get("trade_side", "both")
             sl_pips = sym_cfg.get("stop_loss_pips")
             tp_pips = sym_cfg.get("take_profit_pips")
-            rounding_mode = sym_cfg.get("grid_rounding", "nearest")
+            # brick_size is checked above, so the mode's aligner is called directly
+            align = aligner_for(sym_cfg.get("grid_rounding", "nearest"))
 
-            aligned_base = align_price_to_grid_symbol(symbol, price, brick_size, mode=rounding_mode)
+            aligned_base = align(price, brick_size)
 
-            # sync pending
-            pending = fetch_pending_orders(symbol) or []
-            pending_prices = {align_price_to_grid_symbol(symbol, o.price_open, brick_size)
-                              for o in pending if getattr(o, "price_open", None) is not None}
+            # same brick and no fills/cancels anywhere since the last full pass: skip the fetches
+            with mt5_lock:
+                totals = (mt5.positions_total(), mt5.orders_total())
+            if gate_open and state[0] == aligned_base and state[1:3] == totals:
+                _pause(stop_event, _idle_delay(st, loop_delay))
+                continue
+            st.idle_cycles = 0
+
+            # one pending/positions fetch per tick, shared by the steps below; always
+            # fresh, but stored so order_manager's snapshot reuses it instead of refetching
+            pending = fetch_pending_orders_cached(symbol, max_age=0)
+            positions = fetch_positions_cached(symbol)
+            # (all, buy_stop, sell_stop) price sets, built once per tick; every step
+            # below adds what it places, so later steps see it without a refetch
+            stop_sets = pending_price_sets(symbol, pending, brick_size)
+            pending_prices, stop_buys, stop_sells = stop_sets
             _pending_cache[symbol] = pending_prices
 
             initial_buy = sym_cfg.get("initial_levels_buy", max_up)
             initial_sell = sym_cfg.get("initial_levels_sell", max_down)
 
+            # one placement context per tick, from the tick and positions already in hand
+            ctx = symbol_context(symbol, brick_size, tick=tick, positions=positions)
+
             # INITIAL GRID
-            if (not pending) and (not initial_anchors.get(symbol)):
-                if trade_side in ("buy", "both"):
-                    for i in range(1, int(initial_buy) + 1):
-                        p = align_price_to_grid_symbol(symbol, aligned_base + brick_size * i, brick_size, mode="up")
-                        if p not in pending_prices and not level_has_existing_order_or_position(symbol, p, brick_size):
-                            safe_place_order(mt5.ORDER_TYPE_BUY_STOP, symbol, p, lot_size, brick_size, sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels)
-                            initial_anchors[symbol].add(p)
-                if trade_side in ("sell", "both"):
-                    for i in range(1, int(initial_sell) + 1):
-                        p = align_price_to_grid_symbol(symbol, aligned_base - brick_size * i, brick_size, mode="down")
-                        if p not in pending_prices and not level_has_existing_order_or_position(symbol, p, brick_size):
-                            safe_place_order(mt5.ORDER_TYPE_SELL_STOP, symbol, p, lot_size, brick_size, sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels)
-                            initial_anchors[symbol].add(p)
+            if (not pending) and (not st.initial_anchors):
+                position_prices = ctx.open_prices
+                # both sides in one lock hold, like update_grid()'s batch
+                with mt5_lock:
+                    if trade_side in ("buy", "both"):
+                        for p in grid_levels(aligned_base, brick_size, int(initial_buy), 1):
+                            if p not in pending_prices and p not in position_prices:
+                                if safe_place_order(_BUY_STOP, symbol, p, lot_size, brick_size, sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels,
+                                                    pending_prices=pending_prices, position_prices=position_prices, ctx=ctx,
+                                                    aligned=True):
+                                    stop_buys.add(p)
+                                st.initial_anchors.add(p)
+                    if trade_side in ("sell", "both"):
+                        for p in grid_levels(aligned_base, brick_size, int(initial_sell), -1):
+                            if p not in pending_prices and p not in position_prices:
+                                if safe_place_order(_SELL_STOP, symbol, p, lot_size, brick_size, sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels,
+                                                    pending_prices=pending_prices, position_prices=position_prices, ctx=ctx,
+                                                    aligned=True):
+                                    stop_sells.add(p)
+                                st.initial_anchors.add(p)
 
             # UPDATE GRID
             update_grid(
@@ -603,44 +833,48 @@ def run_symbol_loop(symbol, sym_cfg, config, seen_tickets, closed_levels, initia
                 tp_pips=tp_pips,
                 closed_levels=closed_levels,
                 initial_buy_levels=max_up,
-                initial_sell_levels=max_down
+                initial_sell_levels=max_down,
+                stop_sets=stop_sets,
+                ctx=ctx
             )
 
             # HANDLE MIRRORS
             handle_new_positions_and_create_mirrors(
-                symbol, brick_size, lot_size, seen_tickets, sym_cfg,
+                symbol, brick_size, lot_size, st.seen_tickets, sym_cfg,
                 trade_side, sl_pips=sl_pips, tp_pips=tp_pips, closed_levels=closed_levels,
-                closed_block_seconds=config.get("closed_level_block_seconds", 300)
+                closed_block_seconds=config.get("closed_level_block_seconds", 300),
+                positions=positions, stop_sets=stop_sets, ctx=ctx
             )
 
-            last_price[symbol] = price
+            st.last_price = price
+            # totals read after our own placements, so they don't reopen the gate next tick
+            with mt5_lock:
+                st.grid_state = (aligned_base, mt5.positions_total(), mt5.orders_total(), time.monotonic())
 
-            time.sleep(loop_delay)
+            _pause(stop_event, loop_delay)
 
         except Exception as e:
-            traceback.print_exc()
-            time.sleep(1)
+            print_exc_limited(f"run_symbol_loop({symbol})", e)
+            _pause(stop_event, 1)
 
 # ----------------- Main Grid Loop -----------------
-def run_dynamic_grid(config, trading_active_flag=lambda: True):
+def run_dynamic_grid(config, trading_active_flag=lambda: True, stop_event=None):
     if not initialize_mt5(config["account"], config["password"], config["server"]):
         return
 
-    closed_levels = defaultdict(float)
-    initial_anchors = {sym: set() for sym in config["symbols"]}
-    seen_position_tickets = {sym: set() for sym in config["symbols"]}
+    closed_levels = OrderedDict()
+    states = {sym: SymbolState() for sym in config["symbols"]}
 
     threads = []
-
-    for symbol, sym_cfg in config["symbols"].items():
-        if not sym_cfg.get("active", True):
-            continue
-
-        ok = ensure_symbol_available(symbol, tries=2, delay=0.1)
-        if not ok:
-            pass
-
-        t = Thread(target=run_symbol_loop, args=(symbol, sym_cfg, config, seen_position_tickets[symbol], closed_levels, initial_anchors, trading_active_flag), daemon=True)
+    active = [(s, c) for s, c in config["symbols"].items() if c.get("active", True)]
+    # MT5 serves one call at a time, so threads waking together only queue on
+    # mt5_lock; spread their ticks evenly over loop_delay instead
+    step = config.get("loop_delay", 1) / max(len(active), 1)
+
+    for i, (symbol, sym_cfg) in enumerate(active):
+        # run_symbol_loop() makes the symbol available itself, so threads start
+        # back-to-back instead of each waiting on the previous symbol's checks
+        t = Thread(target=run_symbol_loop, args=(symbol, sym_cfg, config, states[symbol], closed_levels, trading_active_flag, stop_event, i * step), daemon=True)
         t.start()
         threads.append(t)
 
@@ -649,7 +883,7 @@ def run_dynamic_grid(config, trading_active_flag=lambda: True):
 
     try:
         while trading_active_flag():
-            time.sleep(0.5)
+            _pause(stop_event, 0.5)
     except KeyboardInterrupt:
         pass
     finally:
@@ -0,0 +1,10 @@
+# wsgi.py — production entry point
+#
+#   waitress-serve --threads=32 --listen=127.0.0.1:5000 wsgi:app
+#   gunicorn -k gthread -w 1 --threads 32 wsgi:app      (non-Windows)
+#
+# Keep a single worker process: the bot thread, config watcher and MT5
+# terminal connection are per-process state.
+from app import app
+
+__all__ = ["app"]